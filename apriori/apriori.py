@@ -11,6 +11,10 @@ from itertools import combinations
 from itertools import chain
 sys.path.insert(0, '../util')
 import constants
+from item_dictionary import EncodedTransactions
+from transaction_index import TransactionIndex
+from support_table import SupportTable
+from candidate_generation import prefix_join
 
 
 ################################################################################
@@ -27,35 +31,34 @@ class TransactionManager(object):
 
         Arguments:
             transactions -- A transaction iterable object
-                            (eg. [['A', 'B'], ['B', 'C']]).
+                            (eg. [['A', 'B'], ['B', 'C']])
+                            or an EncodedTransactions instance.
         """
-        self.__num_transaction = 0
-        self.__items = []
-        self.__transaction_index_map = {}
+        self.__transaction_index = TransactionIndex()
 
-        for transaction in transactions:
-            self.add_transaction(transaction)
+        # Items are mined as integer ids and decoded only when rules are formed.
+        transactions = EncodedTransactions.create(transactions)
+        self.__item_dictionary = transactions.item_dictionary
 
-    def add_transaction(self, transaction):
+        for transaction, weight in transactions.weighted():
+            self.add_transaction(transaction, weight)
+
+    def add_transaction(self, transaction, weight=1):
         """
         Add a transaction.
 
         Arguments:
-            transaction -- A transaction as an iterable object (eg. ['A', 'B']).
+            transaction -- A transaction as an iterable object of item ids (eg. [0, 1]).
+            weight -- The number of identical rows the transaction stands for.
         """
-        for item in transaction:
-            if item not in self.__transaction_index_map:
-                self.__items.append(item)
-                self.__transaction_index_map[item] = set()
-            self.__transaction_index_map[item].add(self.__num_transaction)
-        self.__num_transaction += 1
+        self.__transaction_index.add_transaction(transaction, weight)
 
     def calc_support(self, items):
         """
         Returns a support for items.
 
         Arguments:
-            items -- Items as an iterable object (eg. ['A', 'B']).
+            items -- Item ids as an iterable object (eg. [0, 1]).
         """
         # Empty items is supported by all transactions.
         if not items:
@@ -65,23 +68,8 @@ class TransactionManager(object):
         if not self.num_transaction:
             return 0.0
 
-        # Create the transaction index intersection.
-        sum_indexes = None
-        for item in items:
-            indexes = self.__transaction_index_map.get(item)
-            if indexes is None:
-                # No support for any set that contains a not existing item.
-                return 0.0
-
-            if sum_indexes is None:
-                # Assign the indexes on the first time.
-                sum_indexes = indexes
-            else:
-                # Calculate the intersection on not the first time.
-                sum_indexes = sum_indexes.intersection(indexes)
-
-        # Calculate and return the support.
-        return len(sum_indexes)
+        # AND the transaction bitmaps of the items and count the set bits.
+        return self.__transaction_index.support(items)
 
     def initial_candidates(self):
         """
@@ -94,21 +82,35 @@ class TransactionManager(object):
         """
         Returns the number of transactions.
         """
-        return self.__num_transaction
+        return self.__transaction_index.num_transaction
 
     @property
     def items(self):
         """
         Returns the item list that the transaction is consisted of.
         """
-        return sorted(self.__items)
+        return sorted(self.__transaction_index.items)
 
     @property
     def transaction_index_map(self):
         """
-        Returns the item list that the transaction is consisted of.
+        Returns the transaction bitmaps of the items.
+        """
+        return self.__transaction_index.bitmaps
+
+    @property
+    def transaction_index(self):
+        """
+        Returns the TransactionIndex of the transactions.
+        """
+        return self.__transaction_index
+
+    @property
+    def item_dictionary(self):
+        """
+        Returns the ItemDictionary used to encode the items.
         """
-        return self.__transaction_index_map
+        return self.__item_dictionary
 
     @staticmethod
     def create(transactions):
@@ -133,37 +135,18 @@ OrderedStatistic = namedtuple( # pylint: disable=C0103
 ################################################################################
 # Inner functions.
 ################################################################################
-def create_next_candidates(prev_candidates, length):
+def create_next_candidates(prev_candidates, length, attribute_of=None):
     """
     Returns the apriori candidates as a list.
 
     Arguments:
-        prev_candidates -- Previous candidates as a list.
+        prev_candidates -- Previous candidates as a set of frozensets.
         length -- The lengths of the next candidates.
+        attribute_of -- A function returning the attribute of an item or None.
     """
-    # Solve the items.
-    item_set = set()
-    for candidate in prev_candidates:
-        for item in candidate:
-            item_set.add(item)
-    items = sorted(item_set)
-
-    # Create the temporary candidates. These will be filtered below.
-    tmp_next_candidates = (frozenset(x) for x in combinations(items, length))
-    # Return all the candidates if the length of the next candidates is 2
-    # because their subsets are the same as items.
-    if length < 3:
-        return list(tmp_next_candidates)
-
-    # Filter candidates that all of their subsets are
-    # in the previous candidates.
-    next_candidates = [
-        candidate for candidate in tmp_next_candidates
-        if all(
-            True if frozenset(x) in prev_candidates else False
-            for x in combinations(candidate, length - 1))
-    ]
-    return next_candidates
+    # Join the previous candidates sharing a prefix instead of enumerating
+    # every combination of their items.
+    return prefix_join(prev_candidates, length, attribute_of)
 
 
 def gen_support_records(transaction_manager, min_support, **kwargs):
@@ -176,9 +159,14 @@ def gen_support_records(transaction_manager, min_support, **kwargs):
 
     Keyword arguments:
         max_length -- The maximum length of relations (integer).
+        attribute_of -- A function returning the attribute of an item id: two values of
+                        an attribute are never joined (default: None, any items are joined).
+        support_table -- A SupportTable filled with the supports of the relations.
     """
     # Parse arguments.
     max_length = kwargs.get('max_length')
+    attribute_of = kwargs.get('attribute_of')
+    support_table = kwargs.get('support_table')
 
     # For testing.
     _create_next_candidates = kwargs.get(
@@ -195,26 +183,34 @@ def gen_support_records(transaction_manager, min_support, **kwargs):
                 continue
             candidate_set = frozenset(relation_candidate)
             relations.add(candidate_set)
+            if support_table is not None:
+                support_table.add(candidate_set, support)
             yield SupportRecord(candidate_set, support)
         length += 1
         if max_length and length > max_length:
             break
-        candidates = _create_next_candidates(relations, length)
+        candidates = _create_next_candidates(relations, length, attribute_of)
 
 
-def gen_ordered_statistics(transaction_manager, record):
+def gen_ordered_statistics(transaction_manager, record, support_table=None):
     """
     Returns a generator of ordered statistics as OrderedStatistic instances.
 
     Arguments:
         transaction_manager -- Transactions as a TransactionManager instance.
         record -- A support record as a SupportRecord instance.
+        support_table -- A SupportTable holding the supports of the previous level or None.
     """
     items = record.items
     for combination_set in combinations(sorted(items), len(items) - 1):
         items_base = frozenset(combination_set)
         items_add = frozenset(items.difference(items_base))
-        antecedent_support = transaction_manager.calc_support(items_base)
+        # The antecedent survived the previous level, so its support is known.
+        antecedent_support = None
+        if support_table is not None:
+            antecedent_support = support_table.get(items_base)
+        if antecedent_support is None:
+            antecedent_support = transaction_manager.calc_support(items_base)
         confidence = float(record.support) / antecedent_support
         yield OrderedStatistic(
             frozenset(items_base), frozenset(items_add), antecedent_support, record.support, confidence)
@@ -264,10 +260,17 @@ def generate_association_rules(transactions, min_support, **kwargs):
         min_confidence -- The minimum confidence of relations (float).
         min_lift -- The minimum lift of relations (float).
         max_length -- The maximum length of the relation (integer).
+        max_support_levels -- The number of itemset lengths whose supports are kept
+                              for rule generation (integer >= 2, default: all).
+        attribute_of -- A function returning the attribute of an item id, for transactions holding
+                        one value per attribute: two values of an attribute are never joined
+                        (default: None, any items are joined).
     """
     # Parse the arguments.
 
     min_confidence = kwargs.get('min_confidence', 0.5)
+    max_support_levels = kwargs.get('max_support_levels')
+    attribute_of = kwargs.get('attribute_of')
 
     # Check arguments.
     if min_support <= 0:
@@ -283,25 +286,29 @@ def generate_association_rules(transactions, min_support, **kwargs):
 
     # Calculate supports.
     transaction_manager = TransactionManager.create(transactions)
+    item_dictionary = transaction_manager.item_dictionary
+    # Supports counted while mining are reused for the antecedents of the rules.
+    support_table = SupportTable(max_support_levels)
     support_records = _gen_support_records(
-        transaction_manager, min_support)
+        transaction_manager, min_support, support_table=support_table, attribute_of=attribute_of)
 
     # Calculate ordered stats.
     rules = []
     for support_record in support_records:
         ordered_statistics = list(
             _filter_ordered_statistics(
-                _gen_ordered_statistics(transaction_manager, support_record),
+                _gen_ordered_statistics(transaction_manager, support_record, support_table),
                 min_confidence=min_confidence,
             )
         )
         if not ordered_statistics:
             continue
         for ordered_statistic in ordered_statistics:
-            antecedent = tuple(sorted(ordered_statistic.items_base))
+            # decode the item ids of antecedent and consequent
+            antecedent = item_dictionary.decode_items(ordered_statistic.items_base)
             # transform antecedent and consequent into sets
             antecedent_set = set(antecedent)
-            consequent = tuple(ordered_statistic.items_add)
+            consequent = item_dictionary.decode_items(ordered_statistic.items_add)
             consequent_set = set(consequent)
             consequent_str = ''
             for el in consequent:
@@ -325,6 +332,8 @@ def generate_association_rules(transactions, min_support, **kwargs):
 
 def generate_classification_rules(transactions, classifier, min_support, **kwargs):
     min_confidence = kwargs.get('min_confidence', 0.5)
+    max_support_levels = kwargs.get('max_support_levels')
+    attribute_of = kwargs.get('attribute_of')
 
     # Check arguments.
     if min_support <= 0:
@@ -342,8 +351,14 @@ def generate_classification_rules(transactions, classifier, min_support, **kwarg
 
     # Calculate supports.
     transaction_manager = TransactionManager.create(transactions)
+    item_dictionary = transaction_manager.item_dictionary
+    # A class with a value that no transaction holds is never the consequent of a rule.
+    classifier = [frozenset(item_dictionary.encode(item) for item in class_set) for class_set in classifier
+                  if all(item in item_dictionary for item in class_set)]
+    # Supports counted while mining are reused for the antecedents of the rules.
+    support_table = SupportTable(max_support_levels)
     support_records = _gen_support_records(
-        transaction_manager, min_support)
+        transaction_manager, min_support, support_table=support_table, attribute_of=attribute_of)
 
     # Calculate ordered stats.
     rules = []
@@ -351,7 +366,7 @@ def generate_classification_rules(transactions, classifier, min_support, **kwarg
         ordered_statistics = list(
             _get_classifications(
                 _filter_ordered_statistics(
-                    _gen_ordered_statistics(transaction_manager, support_record),
+                    _gen_ordered_statistics(transaction_manager, support_record, support_table),
                     min_confidence=min_confidence,
                 ),
                 classifier
@@ -360,10 +375,11 @@ def generate_classification_rules(transactions, classifier, min_support, **kwarg
         if not ordered_statistics:
             continue
         for ordered_statistic in ordered_statistics:
-            antecedent = tuple(sorted(ordered_statistic.items_base))
+            # decode the item ids of antecedent and consequent
+            antecedent = item_dictionary.decode_items(ordered_statistic.items_base)
             # transform antecedent and consequent into sets
             antecedent_set = set(antecedent)
-            consequent = tuple(ordered_statistic.items_add)
+            consequent = item_dictionary.decode_items(ordered_statistic.items_add)
             consequent_set = set(consequent)
             consequent_str = ''
             for el in consequent:
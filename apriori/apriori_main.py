@@ -4,13 +4,15 @@ import time
 
 sys.path.insert(0, '../util')
 import util_functions
+from item_dictionary import census_attribute_of
 
 
 def run(transactions_file_name, classifier, min_supp_count, min_conf, output_file_name=None):
 
-    transactions = util_functions.unzip_transactions_2(transactions_file_name)
+    transactions = util_functions.unzip_encoded_transactions(transactions_file_name, attribute_of=census_attribute_of)
     start = time.time()
-    rules = apriori.generate_association_rules(transactions, min_support=min_supp_count, min_confidence=min_conf)
+    rules = apriori.generate_association_rules(transactions, min_support=min_supp_count, min_confidence=min_conf,
+                                               attribute_of=transactions.item_dictionary.attribute_id)
     # rules = apriori.generate_classification_rules(transactions,
     #                                              classifier,
     #                                              min_support=min_supp_count,
@@ -8,11 +8,14 @@ import sys
 import argparse
 import pandas as pd
 from collections import namedtuple
-from itertools import combinations
 from itertools import chain
 from itertools import product
 sys.path.insert(0, '../util')
 import constants
+from item_dictionary import EncodedTransactions
+from transaction_index import TransactionIndex
+from support_table import SupportTable
+from candidate_generation import prefix_join
 
 
 ################################################################################
@@ -29,38 +32,37 @@ class TransactionManager(object):
 
         Arguments:
             transactions -- A transaction iterable object
-                            (eg. [['A', 'B'], ['B', 'C']]).
+                            (eg. [['A', 'B'], ['B', 'C']])
+                            or an EncodedTransactions instance.
             classifier -- A set containing the classifier classes
                             (ef . {'Class1', 'Class2'})
         """
-        self.__num_transaction = 0
-        self.__items = []
-        self.__classifier = classifier
-        self.__transaction_index_map = {}
+        self.__transaction_index = TransactionIndex()
 
-        for transaction in transactions:
-            self.add_transaction(transaction)
+        # Items are mined as integer ids and decoded only when rules are formed.
+        transactions = EncodedTransactions.create(transactions, sorted(classifier))
+        self.__item_dictionary = transactions.item_dictionary
+        self.__classifier = frozenset(self.__item_dictionary.encode(class_val) for class_val in classifier)
 
-    def add_transaction(self, transaction):
+        for transaction, weight in transactions.weighted():
+            self.add_transaction(transaction, weight)
+
+    def add_transaction(self, transaction, weight=1):
         """
         Add a transaction.
 
         Arguments:
-            transaction -- A transaction as an iterable object (eg. ['A', 'B']).
+            transaction -- A transaction as an iterable object of item ids (eg. [0, 1]).
+            weight -- The number of identical rows the transaction stands for.
         """
-        for item in transaction:
-            if item not in self.__transaction_index_map:
-                self.__items.append(item)
-                self.__transaction_index_map[item] = set()
-            self.__transaction_index_map[item].add(self.__num_transaction)
-        self.__num_transaction += 1
+        self.__transaction_index.add_transaction(transaction, weight)
 
     def calc_support(self, items):
         """
         Returns a support for items.
 
         Arguments:
-            items -- Items as an iterable object (eg. ['A', 'B']).
+            items -- Item ids as an iterable object (eg. [0, 1]).
         """
         # Empty items is supported by all transactions.
         if not items:
@@ -70,23 +72,8 @@ class TransactionManager(object):
         if not self.num_transaction:
             return 0.0
 
-        # Create the transaction index intersection.
-        sum_indexes = None
-        for item in items:
-            indexes = self.__transaction_index_map.get(item)
-            if indexes is None:
-                # No support for any set that contains a not existing item.
-                return 0.0
-
-            if sum_indexes is None:
-                # Assign the indexes on the first time.
-                sum_indexes = indexes
-            else:
-                # Calculate the intersection on not the first time.
-                sum_indexes = sum_indexes.intersection(indexes)
-
-        # Calculate and return the support.
-        return len(sum_indexes)
+        # AND the transaction bitmaps of the items and count the set bits.
+        return self.__transaction_index.support(items)
 
     def initial_candidates(self):
         """
@@ -99,29 +86,43 @@ class TransactionManager(object):
         """
         Returns the number of transactions.
         """
-        return self.__num_transaction
+        return self.__transaction_index.num_transaction
 
     @property
     def items(self):
         """
         Returns the item list that the transaction is consisted of.
         """
-        return sorted(self.__items)
+        return sorted(self.__transaction_index.items)
 
     @property
     def transaction_index_map(self):
         """
-        Returns the transaction index map of the items
+        Returns the transaction bitmaps of the items
+        """
+        return self.__transaction_index.bitmaps
+
+    @property
+    def transaction_index(self):
         """
-        return self.__transaction_index_map
+        Returns the TransactionIndex of the transactions.
+        """
+        return self.__transaction_index
 
     @property
     def classifier(self):
         """
-        Returns the set of the classifier
+        Returns the set of the item ids of the classifier
         """
         return self.__classifier
 
+    @property
+    def item_dictionary(self):
+        """
+        Returns the ItemDictionary used to encode the items.
+        """
+        return self.__item_dictionary
+
     @staticmethod
     def create(transactions, classifier):
         """
@@ -145,37 +146,46 @@ OrderedStatistic = namedtuple( # pylint: disable=C0103
 ################################################################################
 # Inner functions.
 ################################################################################
-def create_next_candidates(prev_candidates, classifier, length):
+def create_next_candidates(prev_candidates, classifier, length, attribute_of=None):
     """
     Returns the apriori candidates as a list.
+    From length 3, the antecedents frequent with a class are joined for that class only,
+    and an antecedent is kept only if all of its subsets were frequent with the same class.
+    The candidates come in the order of the antecedents, completed with every class.
 
     Arguments:
-        prev_candidates -- Previous candidates as a list.
+        prev_candidates -- Previous candidates as a set of frozensets.
+        classifier -- A set of our classes
         length -- The lengths of the next candidates.
+        attribute_of -- A function returning the attribute of an item or None.
     """
-    # Solve the items.
-    item_set = set()
-    for candidate in prev_candidates:
-        for item in candidate:
-            item_set.add(item)
-    items = sorted(item_set)
-
     # If the length is 2 we want to make sure that the next candidates contain our classifier
     # so we proceed by a product between the previous 1-itemset and our classifier
     if length < 3:
-        tmp_next_candidates = (frozenset(x) for x in product(items, classifier))
+        item_set = set()
+        for candidate in prev_candidates:
+            for item in candidate:
+                item_set.add(item)
+        items = sorted(item_set)
+        tmp_next_candidates = (frozenset(x) for x in product(items, classifier)
+                               if attribute_of is None or attribute_of(x[0]) != attribute_of(x[1]))
         return list(tmp_next_candidates)
 
-    # Make sure our items do not contain the classifier
-    items = sorted(set(items) - classifier)
-    # Create a temporary generator for next candidates with len = length - 1
-    # to be completed with our classifier
-    tmp_next_candidates = (x for x in combinations(items, length - 1))
-    # Complete the last item with our classifier
-    tmp_next_candidates = [x for x in product(list(tmp_next_candidates), classifier)]
-    # Using a map function to get the right format
-    tmp_next_candidates = map(lambda x: format(x), tmp_next_candidates)
-    return list(tmp_next_candidates)
+    # Keep the frequent antecedents of every class
+    class_antecedents = {}
+    for candidate in prev_candidates:
+        for class_item in candidate.intersection(classifier):
+            class_antecedents.setdefault(class_item, set()).add(candidate.difference(classifier))
+    # Join the antecedents of every class.
+    next_candidates = []
+    for class_pos, class_item in enumerate(classifier):
+        antecedents = class_antecedents.get(class_item)
+        if not antecedents:
+            continue
+        for antecedent in prefix_join(antecedents, length - 1, attribute_of):
+            next_candidates.append((tuple(sorted(antecedent)), class_pos, antecedent.union([class_item])))
+    next_candidates.sort(key=lambda x: (x[0], x[1]))
+    return [candidate for _, _, candidate in next_candidates]
 
 
 def gen_support_records(transaction_manager, classifier, min_support, **kwargs):
@@ -189,9 +199,14 @@ def gen_support_records(transaction_manager, classifier, min_support, **kwargs):
 
     Keyword arguments:
         max_length -- The maximum length of relations (integer).
+        attribute_of -- A function returning the attribute of an item id: two values of
+                        an attribute are never joined (default: None, any items are joined).
+        support_table -- A SupportTable filled with the supports of the relations.
     """
     # Parse arguments.
     max_length = kwargs.get('max_length')
+    attribute_of = kwargs.get('attribute_of')
+    support_table = kwargs.get('support_table')
 
     # For testing.
     _create_next_candidates = kwargs.get(
@@ -208,29 +223,42 @@ def gen_support_records(transaction_manager, classifier, min_support, **kwargs):
                 continue
             candidate_set = frozenset(relation_candidate)
             relations.add(candidate_set)
+            if support_table is not None:
+                support_table.add(candidate_set, support)
             if length == 1:
                 # We don't need to generate the 1 - frequent items
                 continue
+            if support_table is not None:
+                # Antecedents longer than 1 are never candidates themselves,
+                # count each of them once for all of its classes.
+                antecedent = candidate_set - classifier
+                if antecedent not in support_table:
+                    support_table.add(antecedent, transaction_manager.calc_support(antecedent))
             yield SupportRecord(candidate_set, support)
         length += 1
         if max_length and length > max_length:
             break
-        candidates = _create_next_candidates(relations, classifier, length)
+        candidates = _create_next_candidates(relations, classifier, length, attribute_of)
 
 
-def gen_ordered_statistics(transaction_manager, record):
+def gen_ordered_statistics(transaction_manager, record, support_table=None):
     """
     Returns a generator of ordered statistics as OrderedStatistic instances.
 
     Arguments:
         transaction_manager -- Transactions as a TransactionManager instance.
         record -- A support record as a SupportRecord instance.
+        support_table -- A SupportTable holding the supports of the antecedents or None.
     """
     items = record.items
     combination_set = sorted(set(items) - transaction_manager.classifier.intersection(set(items)))
     items_base = frozenset(combination_set)
     items_add = frozenset(transaction_manager.classifier.intersection(set(items)))
-    antecedent_support = transaction_manager.calc_support(items_base)
+    antecedent_support = None
+    if support_table is not None:
+        antecedent_support = support_table.get(items_base)
+    if antecedent_support is None:
+        antecedent_support = transaction_manager.calc_support(items_base)
     confidence = record.support / antecedent_support
     yield OrderedStatistic(
         frozenset(items_base), frozenset(items_add), antecedent_support, record.support, confidence)
@@ -272,12 +300,19 @@ def CAR_apriori(transactions, classifier, **kwargs):
         min_confidence -- The minimum confidence of relations (float).
         min_lift -- The minimum lift of relations (float).
         max_length -- The maximum length of the relation (integer).
+        max_support_levels -- The number of itemset lengths whose supports are kept
+                              for rule generation (integer >= 2, default: all).
+        attribute_of -- A function returning the attribute of an item id, for transactions holding
+                        one value per attribute: two values of an attribute are never joined
+                        (default: None, any items are joined).
     """
     # Parse the arguments.
     min_support = kwargs.get('min_support', 0.1)
     min_confidence = kwargs.get('min_confidence', 0.0)
     min_lift = kwargs.get('min_lift', 0.0)
     max_length = kwargs.get('max_length', None)
+    max_support_levels = kwargs.get('max_support_levels')
+    attribute_of = kwargs.get('attribute_of')
 
     # Check arguments.
     if min_support <= 0:
@@ -293,15 +328,19 @@ def CAR_apriori(transactions, classifier, **kwargs):
 
     # Calculate supports.
     transaction_manager = TransactionManager.create(transactions, classifier)
+    item_dictionary = transaction_manager.item_dictionary
+    # Supports counted while mining are reused for the antecedents of the rules.
+    support_table = SupportTable(max_support_levels)
     support_records = _gen_support_records(
-        transaction_manager, classifier, min_support, max_length=max_length)
+        transaction_manager, transaction_manager.classifier, min_support, max_length=max_length,
+        support_table=support_table, attribute_of=attribute_of)
 
     # Calculate ordered stats.
     rules = []
     for support_record in support_records:
         ordered_statistics = list(
             _filter_ordered_statistics(
-                _gen_ordered_statistics(transaction_manager, support_record),
+                _gen_ordered_statistics(transaction_manager, support_record, support_table),
                 min_confidence=min_confidence,
                 min_lift=min_lift,
             )
@@ -309,10 +348,11 @@ def CAR_apriori(transactions, classifier, **kwargs):
         if not ordered_statistics:
             continue
         for ordered_statistic in ordered_statistics:
-            antecedent = tuple(sorted(ordered_statistic.items_base))
+            # decode the item ids of antecedent and consequent
+            antecedent = item_dictionary.decode_items(ordered_statistic.items_base)
             # transform antecedent and consequent into sets
             antecedent_set = set(antecedent)
-            consequent = tuple(ordered_statistic.items_add)
+            consequent = item_dictionary.decode_items(ordered_statistic.items_add)
             consequent_set = set(consequent)
             consequent_str = ''
             for el in consequent:
@@ -4,14 +4,17 @@ import time
 import util_functions
 
 sys.path.insert(0, '../util')
+from item_dictionary import census_attribute_of
 
 
 def run(transactions_file_name, min_supp_count, min_conf, output_file_name=None):
 
-    transactions = util_functions.unzip_transactions_2(transactions_file_name)
     classifier = {'NO', 'YES'}
+    transactions = util_functions.unzip_encoded_transactions(transactions_file_name, sorted(classifier),
+                                                             attribute_of=census_attribute_of)
     start = time.time()
-    rules = car.CAR_apriori(transactions, classifier, min_support=min_supp_count, min_confidence=min_conf)
+    rules = car.CAR_apriori(transactions, classifier, min_support=min_supp_count, min_confidence=min_conf,
+                            attribute_of=transactions.item_dictionary.attribute_id)
     end = time.time()
     print('Total elapsed {}'.format((end - start)))
     if output_file_name is not None:
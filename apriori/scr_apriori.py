@@ -6,15 +6,21 @@ this is an implementation of SCR-apriori algorithm based on an existing apriori
 
 import sys
 import argparse
+import copy
+import heapq
 import pandas as pd
 from collections import namedtuple
-from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
 from itertools import chain
 from itertools import product
-from itertools import tee
 from memory_profiler import profile
 sys.path.insert(0, '../util')
 import constants
+from item_dictionary import EncodedTransactions
+from item_dictionary import census_attribute_of
+from transaction_index import TransactionIndex
+from transaction_index import bitmap_to_tids
+from candidate_generation import prefix_join
 
 
 ################################################################################
@@ -25,92 +31,146 @@ class TransactionManager(object):
     Transaction managers.
     """
 
-    def __init__(self, transactions, inv, var, classifier):
+    def __init__(self, transactions, inv, var, classifier, attribute_code_of=census_attribute_of):
         """
         Initialize.
 
         Arguments:
             transactions -- A transaction iterable object
-                            (eg. [['A', 'B'], ['B', 'C']]).
+                            (eg. [['A', 'B'], ['B', 'C']])
+                            or an EncodedTransactions instance.
             non_varying -- A set containing the non varying attributes
                             (eg. { '01', '03, '12' })
             varying -- A set containing the varying attributes
                             (eg. { '01', '03, '12' })
-            classifier -- A set containing the classifier classes
-                            (ef . {'Class1', 'Class2'})
+            classifier -- A list containing the classifier classes, any number of them
+                            (ef . ['Class1', 'Class2'])
+            attribute_code_of -- A function returning the attribute code of an item,
+                                 used to encode a transaction iterable object.
         """
         self.__num_transaction = 0
-        self.__items = []
-        self.__classifier = classifier
-        self.__transaction_index_map = {}
         self.__inv = inv
         self.__var = var
 
-        for transaction in transactions:
-            self.add_transaction(transaction)
-
-        self.__num_class_1 = len(self.__transaction_index_map.get(self.classifier[0]))
-        self.__num_class_2 = self.__num_transaction - self.__num_class_1
-
-    def add_transaction(self, transaction):
+        # Items are mined as integer ids and decoded only when rules are formed.
+        transactions = EncodedTransactions.create(transactions, classifier, attribute_code_of)
+        self.__item_dictionary = transactions.item_dictionary
+        self.__classifier = [self.__item_dictionary.encode(class_val) for class_val in classifier]
+
+        # One bit per attribute: the attribute signature of an itemset is the OR of the bits of its items.
+        self.__attribute_bits = [1 << attribute_id for attribute_id in self.__item_dictionary.attribute_ids]
+        self.__invariable_mask = 0
+        self.__variable_mask = 0
+        for attribute_id, attribute_code in enumerate(self.__item_dictionary.attribute_codes):
+            if attribute_code in inv:
+                self.__invariable_mask |= 1 << attribute_id
+            elif attribute_code in var:
+                self.__variable_mask |= 1 << attribute_id
+
+        # One transaction index per class: the transactions of a class are indexed
+        # only in the index of that class.
+        self.__class_positions = {}
+        for class_pos, class_item in enumerate(self.__classifier):
+            self.__class_positions[class_item] = class_pos
+        self.__class_transaction_indexes = [TransactionIndex() for _ in self.__classifier]
+        # the (transaction, weight) of every row of the index of every class, to index partitions of them
+        self.__class_rows = [[] for _ in self.__classifier]
+
+        for transaction, weight in transactions.weighted():
+            self.add_transaction(transaction, weight)
+
+    def add_transaction(self, transaction, weight=1):
         """
         Add a transaction.
 
         Arguments:
-            transaction -- A transaction as an iterable object (eg. ['A', 'B']).
+            transaction -- A transaction as an iterable object of item ids (eg. [0, 1]).
+            weight -- The number of identical rows the transaction stands for.
         """
+        self.__num_transaction += weight
         for item in transaction:
-            if item not in self.__transaction_index_map:
-                if item not in self.__classifier:
-                    self.__items.append(item)
-                self.__transaction_index_map[item] = set()
-            self.__transaction_index_map[item].add(self.__num_transaction)
-        self.__num_transaction += 1
+            class_pos = self.__class_positions.get(item)
+            if class_pos is not None:
+                self.__class_transaction_indexes[class_pos].add_transaction(transaction, weight)
+                self.__class_rows[class_pos].append((transaction, weight))
+                break
 
-    def calc_support(self, items):
+    def calc_support(self, items, class_bitmaps=None):
         """
-        Returns a support for items with reference to the classifier.
+        Returns a support for items with reference to the classifier:
+        a tuple with the count of every class in the order of the classifier.
 
         Arguments:
-            items -- Items as an iterable object (eg. ['A', 'B']).
+            items -- Item ids as an iterable object (eg. [0, 1]).
+            class_bitmaps -- The bitmaps of partition_bitmaps to count the transactions
+                             of a partition only or None to count all of them.
         """
         # Empty items is supported by all transactions.
         if not items:
-            return 1.0, 1.0
+            return tuple(1.0 for _ in self.__classifier)
 
         # Empty transactions supports no items.
         if not self.num_transaction:
-            return 0.0, 0.0
+            return tuple(0.0 for _ in self.__classifier)
+
+        # Count the items on the transaction index of every class.
+        if class_bitmaps is None:
+            return tuple(class_transaction_index.support(items)
+                         for class_transaction_index in self.__class_transaction_indexes)
+        return tuple(class_transaction_index.count(class_bitmap & class_transaction_index.intersection(items))
+                     for class_transaction_index, class_bitmap
+                     in zip(self.__class_transaction_indexes, class_bitmaps))
+
+    def partition_bitmaps(self, items):
+        """
+        Returns the bitmaps of the transactions that contain all the items
+        in the transaction index of every class, or None if items is empty.
 
-        # Create the transaction index intersection.
-        sum_indexes_1 = None
-        sum_indexes_2 = None
+        Arguments:
+            items -- Item ids as an iterable object (eg. [0, 1]).
+        """
+        if not items:
+            return None
+        return tuple(class_transaction_index.intersection(items)
+                     for class_transaction_index in self.__class_transaction_indexes)
+
+    def partition(self, items):
+        """
+        Returns a TransactionManager of the transactions that contain all the items,
+        indexed on their own rows, so its bitmaps are only as wide as the partition.
+        Returns itself if items is empty.
+
+        Arguments:
+            items -- Item ids as an iterable object (eg. [0, 1]).
+        """
+        if not items:
+            return self
+        partition = copy.copy(self)
+        partition.__num_transaction = 0
+        partition.__class_transaction_indexes = []
+        partition.__class_rows = []
+        for class_transaction_index, class_rows in zip(self.__class_transaction_indexes, self.__class_rows):
+            partition_index = TransactionIndex()
+            partition_rows = [class_rows[tid] for tid in bitmap_to_tids(class_transaction_index.intersection(items))]
+            for transaction, weight in partition_rows:
+                partition_index.add_transaction(transaction, weight)
+            partition.__num_transaction += partition_index.num_transaction
+            partition.__class_transaction_indexes.append(partition_index)
+            partition.__class_rows.append(partition_rows)
+        return partition
+
+    def attribute_mask(self, items):
+        """
+        Returns the attribute signature of items: the bitmask of their attributes.
+
+        Arguments:
+            items -- Item ids as an iterable object (eg. [0, 1]).
+        """
+        attribute_bits = self.__attribute_bits
+        mask = 0
         for item in items:
-            indexes_class_1 = self.__transaction_index_map.get(item).intersection(self.__transaction_index_map.get(
-                self.__classifier[0]
-            ))
-            indexes_class_2 = self.__transaction_index_map.get(item).intersection(self.__transaction_index_map.get(
-                self.__classifier[1]
-            ))
-            if indexes_class_1 is None and indexes_class_2 is None:
-                # No support for any set that contains a not existing item.
-                return 0.0, 0.0
-
-            if sum_indexes_1 is None:
-                # Assign the indexes on the first time.
-                sum_indexes_1 = indexes_class_1
-
-            if sum_indexes_2 is None:
-                # Assign the indexes on the first time.
-                sum_indexes_2 = indexes_class_2
-
-            else:
-                # Calculate the intersection on not the first time.
-                sum_indexes_1 = sum_indexes_1.intersection(indexes_class_1)
-                sum_indexes_2 = sum_indexes_2.intersection(indexes_class_2)
-
-        # Calculate and return the support.
-        return len(sum_indexes_1), len(sum_indexes_2)
+            mask |= attribute_bits[item]
+        return mask
 
     def initial_candidates(self):
         """
@@ -125,41 +185,59 @@ class TransactionManager(object):
         """
         return self.__num_transaction
 
+    @property
+    def num_class(self):
+        """
+        Returns the number of transactions of every class in the order of the classifier.
+        """
+        return [class_transaction_index.num_transaction
+                for class_transaction_index in self.__class_transaction_indexes]
+
     @property
     def num_class_1(self):
         """
         Returns the number of transactions.
         """
-        return self.__num_class_1
+        return self.num_class[0]
 
     @property
     def num_class_2(self):
         """
         Returns the number of transactions.
         """
-        return self.__num_class_2
+        return self.num_class[1]
 
     @property
     def items(self):
         """
         Returns the item list that the transaction is consisted of.
         """
-        return sorted(self.__items)
+        items = set()
+        for class_transaction_index in self.__class_transaction_indexes:
+            items.update(class_transaction_index.items)
+        return sorted(items.difference(self.__classifier))
 
     @property
-    def transaction_index_map(self):
+    def class_transaction_indexes(self):
         """
-        Returns the transaction index map of the items
+        Returns the TransactionIndex of every class in the order of the classifier.
         """
-        return self.__transaction_index_map
+        return self.__class_transaction_indexes
 
     @property
     def classifier(self):
         """
-        Returns the set of the classifier
+        Returns the list of the item ids of the classifier
         """
         return self.__classifier
 
+    @property
+    def item_dictionary(self):
+        """
+        Returns the ItemDictionary used to encode the items.
+        """
+        return self.__item_dictionary
+
     @property
     def invariable_attributes(self):
         """
@@ -174,15 +252,36 @@ class TransactionManager(object):
         """
         return self.__var
 
+    @property
+    def attribute_bits(self):
+        """
+        Returns the list of the attribute bits indexed by item id.
+        """
+        return self.__attribute_bits
+
+    @property
+    def invariable_mask(self):
+        """
+        Returns the bitmask of the invariable attributes.
+        """
+        return self.__invariable_mask
+
+    @property
+    def variable_mask(self):
+        """
+        Returns the bitmask of the variable attributes.
+        """
+        return self.__variable_mask
+
     @staticmethod
-    def create(transactions, inv, var, classifier):
+    def create(transactions, inv, var, classifier, attribute_code_of=census_attribute_of):
         """
         Create the TransactionManager with a transaction instance.
         If the given instance is a TransactionManager, this returns itself.
         """
         if isinstance(transactions, TransactionManager):
             return transactions
-        return TransactionManager(transactions, inv, var, classifier)
+        return TransactionManager(transactions, inv, var, classifier, attribute_code_of)
 
 
 # Ignore name errors because these names are namedtuples.
@@ -200,36 +299,18 @@ OrderedStatistic = namedtuple( # pylint: disable=C0103
 ################################################################################
 # Inner functions.
 ################################################################################
-def create_next_candidates(prev_candidates, length):
+def create_next_candidates(prev_candidates, length, attribute_of=None):
     """
     Returns the apriori candidates as a list.
 
     Arguments:
-        prev_candidates -- Previous candidates as a list.
+        prev_candidates -- Previous candidates as a set of frozensets.
         length -- The lengths of the next candidates.
+        attribute_of -- A function returning the attribute of an item or None.
     """
-    # Solve the items.
-    item_set = set()
-    for candidate in prev_candidates:
-        for item in candidate:
-            item_set.add(item)
-    items = sorted(item_set)
-    # Create the temporary candidates. These will be filtered below.
-    tmp_next_candidates = (frozenset(x) for x in combinations(items, length))
-    # Return all the candidates if the length of the next candidates is 2
-    # because their subsets are the same as items.
-    if length < 3:
-        return list(tmp_next_candidates)
-
-    # Filter candidates that all of their subsets are
-    # in the previous candidates.
-    next_candidates = [
-        candidate for candidate in tmp_next_candidates
-        if all(
-            True if frozenset(x) in prev_candidates else False
-            for x in combinations(candidate, length - 1))
-    ]
-    return next_candidates
+    # Join the previous candidates sharing a prefix instead of enumerating
+    # every combination of their items.
+    return prefix_join(prev_candidates, length, attribute_of)
 
 
 def gen_support_records(transaction_manager, min_support, **kwargs):
@@ -242,7 +323,12 @@ def gen_support_records(transaction_manager, min_support, **kwargs):
         transaction_manager -- Transactions as a TransactionManager instance.
         min_support -- A minimum support (float).
 
+    Keyword arguments:
+        attribute_of -- A function returning the attribute of an item id: two values of
+                        an attribute are never joined (default: None, any items are joined).
     """
+    # Parse arguments.
+    attribute_of = kwargs.get('attribute_of')
 
     # For testing.
     _create_next_candidates = kwargs.get(
@@ -255,8 +341,8 @@ def gen_support_records(transaction_manager, min_support, **kwargs):
         relations = set()
         for relation_candidate in candidates:
             support = transaction_manager.calc_support(relation_candidate)
-            # Exclude candidates with support less than min_support in both classes
-            if support[0] < min_support and support[1] < min_support:
+            # Exclude candidates with support less than min_support in all classes
+            if max(support) < min_support:
                 continue
             candidate_set = frozenset(relation_candidate)
             relations.add(candidate_set)
@@ -265,14 +351,190 @@ def gen_support_records(transaction_manager, min_support, **kwargs):
             if support[0] > min_support and support[1] > min_support:
                 continue"""
             # Exclude candidates whith no variable attributes
-            if not attributes(relation_candidate).intersection(transaction_manager.variable_attributes):
+            if not transaction_manager.attribute_mask(relation_candidate) & transaction_manager.variable_mask:
                 continue
             # Exclude candidates with length 1
             if length == 1:
                 continue
             yield SupportRecord(candidate_set, support)
         length += 1
-        candidates = _create_next_candidates(relations, length)
+        candidates = _create_next_candidates(relations, length, attribute_of)
+
+
+def gen_invariable_partitions(transaction_manager, min_support, **kwargs):
+    """
+    Returns a generator of the partitions of the search space: the empty itemset
+    and the itemsets of invariable items with support not less than min_support in a class.
+    SCR rules only pair itemsets with the same invariable items, so every partition is mined on its own.
+
+    Arguments:
+        transaction_manager -- Transactions as a TransactionManager instance.
+        min_support -- A minimum support (float).
+
+    Keyword arguments:
+        attribute_of -- A function returning the attribute of an item id: two values of
+                        an attribute are never joined (default: None, any items are joined).
+    """
+    attribute_of = kwargs.get('attribute_of')
+    attribute_bits = transaction_manager.attribute_bits
+    invariable_mask = transaction_manager.invariable_mask
+
+    yield frozenset()
+    candidates = [frozenset([item]) for item in transaction_manager.items
+                  if attribute_bits[item] & invariable_mask]
+    length = 1
+    while candidates:
+        relations = set()
+        for candidate in candidates:
+            if max(transaction_manager.calc_support(candidate)) < min_support:
+                continue
+            relations.add(candidate)
+            yield candidate
+        length += 1
+        candidates = create_next_candidates(relations, length, attribute_of)
+
+
+def gen_partition_levels(transaction_manager, invariable_items, min_support, **kwargs):
+    """
+    Returns a generator of the support records of gen_support_records whose invariable items
+    are exactly invariable_items, as one list per itemset length from len(invariable_items) + 1 up.
+    The other items are mined level by level and counted in the transactions
+    that contain invariable_items only.
+
+    Arguments:
+        transaction_manager -- Transactions as a TransactionManager instance.
+        invariable_items -- The invariable items of the partition as a frozenset.
+        min_support -- A minimum support (float).
+
+    Keyword arguments:
+        attribute_of -- A function returning the attribute of an item id: two values of
+                        an attribute are never joined (default: None, any items are joined).
+        compact -- Count on TransactionManager.partition, indexed on the transactions of the partition only,
+                   instead of on the transaction bitmaps of the partition in transaction_manager
+                   (default: False).
+    """
+    attribute_of = kwargs.get('attribute_of')
+    if kwargs.get('compact', False):
+        transaction_manager = transaction_manager.partition(invariable_items)
+        class_bitmaps = None
+    else:
+        class_bitmaps = transaction_manager.partition_bitmaps(invariable_items)
+    attribute_bits = transaction_manager.attribute_bits
+    invariable_mask = transaction_manager.invariable_mask
+    variable_mask = transaction_manager.variable_mask
+
+    candidates = [frozenset([item]) for item in transaction_manager.items
+                  if not attribute_bits[item] & invariable_mask]
+    length = 1
+    while candidates:
+        relations = set()
+        records = []
+        for candidate in candidates:
+            support = transaction_manager.calc_support(candidate, class_bitmaps)
+            # Exclude candidates with support less than min_support in all classes
+            if max(support) < min_support:
+                continue
+            relations.add(candidate)
+            # Exclude candidates whith no variable attributes
+            if not transaction_manager.attribute_mask(candidate) & variable_mask:
+                continue
+            # Exclude candidates with length 1
+            if length + len(invariable_items) == 1:
+                continue
+            records.append(SupportRecord(candidate.union(invariable_items), support))
+        yield records
+        length += 1
+        candidates = create_next_candidates(relations, length, attribute_of)
+
+
+def merge_partition_levels(partition_levels):
+    """
+    Returns a generator of the support records of the partitions in the level-wise order
+    of the candidates of apriori, merged one itemset length at a time:
+    a partition is only advanced to its next level when all the shorter records are yielded.
+
+    Arguments:
+        partition_levels -- (first length, iterator of the record lists of the lengths from it up)
+                            of every partition (eg. the partitions of gen_partition_levels).
+    """
+    heap = [(length, pos, levels) for pos, (length, levels) in enumerate(partition_levels)]
+    heapq.heapify(heap)
+    while heap:
+        length = heap[0][0]
+        records = []
+        while heap and heap[0][0] == length:
+            _, pos, levels = heapq.heappop(heap)
+            level_records = next(levels, None)
+            if level_records is None:
+                continue
+            records.extend(level_records)
+            heapq.heappush(heap, (length + 1, pos, levels))
+        records.sort(key=lambda record: sorted(record.items))
+        for record in records:
+            yield record
+
+
+# the transaction manager of a worker process, set once by init_worker
+_worker_transaction_manager = None
+
+
+def init_worker(transaction_manager):
+    """
+    Keep the transaction manager in a worker process.
+    """
+    global _worker_transaction_manager
+    _worker_transaction_manager = transaction_manager
+
+
+def mine_worker_partition(args):
+    """
+    Returns the record lists of gen_partition_levels of a partition as a list,
+    counted on the transactions of the partition only.
+    args are the invariable items of the partition, the minimum support and the attribute function.
+    """
+    invariable_items, min_support, attribute_of = args
+    return list(gen_partition_levels(_worker_transaction_manager, invariable_items, min_support,
+                                     attribute_of=attribute_of, compact=True))
+
+
+def gen_partitioned_support_records(transaction_manager, min_support, **kwargs):
+    """
+    Returns the support records of gen_support_records, in the same order,
+    mined in the independent partitions of gen_invariable_partitions.
+
+    In this process, all the partitions advance one level at a time and count
+    on the bitmaps of their transactions in transaction_manager. With workers, a worker mines
+    a whole partition on a TransactionManager.partition of its own and the records of the partitions
+    are merged once they are all mined.
+
+    Arguments:
+        transaction_manager -- Transactions as a TransactionManager instance.
+        min_support -- A minimum support (float).
+
+    Keyword arguments:
+        workers -- The number of processes mining the partitions
+                   (default: None, the partitions are mined in this process).
+        attribute_of -- A function returning the attribute of an item id: two values of
+                        an attribute are never joined (default: None, any items are joined).
+    """
+    workers = kwargs.get('workers')
+    attribute_of = kwargs.get('attribute_of')
+
+    partitions = list(gen_invariable_partitions(transaction_manager, min_support, attribute_of=attribute_of))
+    if workers is None or workers <= 1:
+        partition_levels = [(len(invariable_items) + 1,
+                             gen_partition_levels(transaction_manager, invariable_items, min_support,
+                                                  attribute_of=attribute_of))
+                            for invariable_items in partitions]
+    else:
+        tasks = [(invariable_items, min_support, attribute_of) for invariable_items in partitions]
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(transaction_manager,)) as executor:
+            partition_levels = [(len(invariable_items) + 1, iter(levels))
+                                for invariable_items, levels in zip(partitions,
+                                                                    executor.map(mine_worker_partition, tasks))]
+    for record in merge_partition_levels(partition_levels):
+        yield record
 
 
 def gen_attribute_records(transaction_manager, record, min_support):
@@ -284,13 +546,15 @@ def gen_attribute_records(transaction_manager, record, min_support):
         record -- A support record as a SupportRecord instance.
         min_support -- A minimum support (float).
     """
-    attributes = ''
-    items = sorted(record.items)
+    attribute_bits = transaction_manager.attribute_bits
+    invariable_mask = transaction_manager.invariable_mask
+    attributes = 0
     variable_items = []
     invariable_items = []
-    for item in items:
-        attributes += item[:2]
-        if item[:2] in transaction_manager.invariable_attributes:
+    for item in record.items:
+        attribute_bit = attribute_bits[item]
+        attributes |= attribute_bit
+        if attribute_bit & invariable_mask:
             invariable_items.append(item)
         else:
             variable_items.append(item)
@@ -301,25 +565,24 @@ def gen_attribute_records(transaction_manager, record, min_support):
             attributes, invariable_items, variable_items, record.support)
 
 
-def filter_ordered_statistics(transaction_manager, attribute_records, pairs_count, **kwargs):
+def filter_ordered_statistics(transaction_manager, attribute_records, paired_attributes, **kwargs):
     """
     Filter AttributeRecord objects that have no contrasting rules.
 
     Arguments:
         transaction_manager -- Transactions as a TransactionManager instance.
-        ordered_statistics -- An AttributeRecord iterable object.
-        pair_count -- A dictionary of attributes and their counts
+        attribute_records -- An AttributeRecord iterable object.
+        paired_attributes -- A set of the attributes shared by more than one attribute record
 
     """
     min_confidence = kwargs.get('min_confidence', 0.5)
-    g = {k: v for k, v in pairs_count.items() if v > 1}
     for attribute_record in attribute_records:
-        if attribute_record.attributes in g.keys():
+        if attribute_record.attributes in paired_attributes:
             cond_set = attribute_record.support
             class_index = cond_set.index(max(cond_set))
             class_name = transaction_manager.classifier[class_index]
             rule_support = cond_set[class_index]
-            global_antecedent_count = cond_set[0] + cond_set[1]
+            global_antecedent_count = sum(cond_set)
             confidence = float(rule_support) / global_antecedent_count
             if confidence >= min_confidence:
                 yield OrderedStatistic(
@@ -332,6 +595,40 @@ def filter_ordered_statistics(transaction_manager, attribute_records, pairs_coun
                     confidence)
 
 
+def gen_level_attribute_records(transaction_manager, support_records, min_support, **kwargs):
+    """
+    Returns a generator of the attribute records of every level of support records
+    and the set of their attribute signatures shared by more than one record.
+    Support records come level by level and records are grouped by their signature within a level,
+    so the groups of a level are complete when the next level starts and only one level is kept.
+    With one value per attribute, as in the census data, a signature only occurs at one length.
+
+    Arguments:
+        transaction_manager -- Transactions as a TransactionManager instance.
+        support_records -- A SupportRecord iterable object, in the order of their lengths.
+        min_support -- A minimum support (float).
+    """
+    # For testing.
+    _gen_attribute_records = kwargs.get(
+        '_gen_attribute_records', gen_attribute_records)
+
+    level_length = None
+    attribute_records = []
+    attributes_count = {}
+    for support_record in support_records:
+        if len(support_record.items) != level_length:
+            if attribute_records:
+                yield attribute_records, set(k for k, v in attributes_count.items() if v > 1)
+            level_length = len(support_record.items)
+            attribute_records = []
+            attributes_count = {}
+        for attribute_record in _gen_attribute_records(transaction_manager, support_record, min_support):
+            attribute_records.append(attribute_record)
+            attributes_count[attribute_record.attributes] = attributes_count.get(attribute_record.attributes, 0) + 1
+    if attribute_records:
+        yield attribute_records, set(k for k, v in attributes_count.items() if v > 1)
+
+
 ################################################################################
 # API function.
 ################################################################################
@@ -347,10 +644,21 @@ def generate_contrasting_rules(transactions, classifier, inv, var, min_support,
     Keyword arguments:
         min_support -- The minimum support of relations (float).
         min_confidence -- The minimum confidence of relations (float).
+        workers -- If given, the itemsets are mined in the partitions of their invariable items
+                   in that many processes (default: None, the itemsets are mined level by level).
+                   It is passed on to _gen_support_records like attribute_of.
+        attribute_of -- A function returning the attribute of an item id, for transactions holding
+                        one value per attribute: two values of an attribute are never joined
+                        (default: None, any items are joined).
+        attribute_code_of -- A function returning the attribute code of an item, the codes of inv and var,
+                             used to encode a transaction iterable object (default: census_attribute_of).
     """
     # Parse the arguments.
 
     min_confidence = kwargs.get('min_confidence', 0.5)
+    workers = kwargs.get('workers')
+    attribute_of = kwargs.get('attribute_of')
+    attribute_code_of = kwargs.get('attribute_code_of', census_attribute_of)
 
     # Check arguments.
     if min_support <= 0:
@@ -358,126 +666,139 @@ def generate_contrasting_rules(transactions, classifier, inv, var, min_support,
 
     # For testing.
     _gen_support_records = kwargs.get(
-        '_gen_support_records', gen_support_records)
+        '_gen_support_records', gen_support_records if workers is None else gen_partitioned_support_records)
     _gen_attribute_records = kwargs.get(
         '_gen_attribute_records', gen_attribute_records)
     _filter_ordered_statistics = kwargs.get(
         '_filter_ordered_statistics', filter_ordered_statistics)
 
     # Calculate supports.
-    transaction_manager = TransactionManager.create(transactions, inv, var, classifier)
+    transaction_manager = TransactionManager.create(transactions, inv, var, classifier, attribute_code_of)
     support_records = _gen_support_records(
-        transaction_manager, min_support)
+        transaction_manager, min_support, attribute_of=attribute_of, workers=workers)
+
+    # Calculate ordered stats, one level of support records at a time.
+    # The groups of a level are complete, so only their paired rules are kept.
+    rules = []
+    for attribute_records, paired_attributes in gen_level_attribute_records(
+            transaction_manager, support_records, min_support, _gen_attribute_records=_gen_attribute_records):
+        res = {}
+        for ordered_statistic in _filter_ordered_statistics(
+                transaction_manager,
+                attribute_records,
+                paired_attributes,
+                min_confidence=min_confidence):
+            if ordered_statistic.attributes not in res:
+                res[ordered_statistic.attributes] = []
+            res[ordered_statistic.attributes].append(ordered_statistic)
+        filter_pairs(res, transaction_manager, rules)
+    return rules
 
-    # Calculate ordered stats.
-    support_records, support_records_clone = tee(support_records)
-    res = {}
+
+def filter_pairs(res, transaction_manager, rules=None):
     """
-    Filling a set containing the count of each attribute
+    Returns the rules of res that form a contrasting pair with at least one other rule of their group,
+    separated by an empty set between the groups. The links of a rule are the positions (counted from 1)
+    of its pairs among the paired rules of its group, in the order the rules were mined.
+
+    Arguments:
+        res -- A dictionary of the attribute signatures and the lists of their OrderedStatistic instances.
+        transaction_manager -- Transactions as a TransactionManager instance.
+        rules -- The rules of the groups filtered before, which the rules of res are appended to, or None.
     """
-    pairs_count = {}
-    for support_record in support_records:
-        attribute_records = list(_gen_attribute_records(transaction_manager, support_record, min_support))
-        for attribute_record in attribute_records:
-            if attribute_record.attributes not in pairs_count.keys():
-                pairs_count[attribute_record.attributes] = 1
-            else:
-                pairs_count[attribute_record.attributes] += 1
-
-    #count = 0
-    for support_record in support_records_clone:
-        filtered_statistics = list(
-            _filter_ordered_statistics(
-                transaction_manager,
-                _gen_attribute_records(transaction_manager, support_record, min_support),
-                pairs_count,
-                min_confidence=min_confidence,
-            )
-        )
-        if not filtered_statistics:
-            continue
-        if filtered_statistics[0].attributes not in res:
-            res[filtered_statistics[0].attributes] = []
-        res[filtered_statistics[0].attributes].append(filtered_statistics)
-        """if count == 0:
-            res.append(filtered_statistics)
-            count += 1
+    if rules is None:
+        rules = []
+    for group in res.values():
+        group_links = get_pair_links(group)
+        if not group_links:
             continue
-        if res[count-1][0].attributes == filtered_statistics[0].attributes:
-            res[count-1] += filtered_statistics
-            continue"""
-        #res.append(filtered_statistics)
-        #count += 1
-    res = filter_pairs(res, transaction_manager)
-    return res
-
-
-def filter_pairs(res, transaction_manager):
-    list_of_pairs = []
-    for val in list(res.values()):
-        list_of_pairs.append(list(combinations(val, 2)))
-    rules = []
-    for group in list_of_pairs:
-        temp = set()
-        if not group:
-            continue
-        for pair in group:
-            if pair[0][0].class_name == pair[1][0].class_name:
-                continue
-            if pair[0][0].invariable_items != pair[1][0].invariable_items:
-                continue
-            if pair[0][0].invariable_items == frozenset():
-                if pair[0][0].variable_items.intersection(pair[1][0].variable_items) == frozenset():
-                    continue
-            temp.add(pair[0][0])
-            temp.add(pair[1][0])
-        if temp != set():
-            rules.append(temp)
-    links = {}
-    for group in rules:
-        for rule1 in group:
-            links[rule1] = ''
-            for rule2 in group:
-                if rule1 != rule2 and rule1.class_name != rule2.class_name \
-                        and (rule1.invariable_items == rule2.invariable_items) \
-                        and (rule1.invariable_items != frozenset() or rule1.variable_items.intersection(rule2.variable_items) != frozenset()):
-                    # tests:
-                    # 1. rules are different
-                    # 2. classes are different
-                    # 3. invariant attributes should have the same values
-                    # 4. if no invariant attributes, at least 1 varying attribute should have the same values
-                    links[rule1] += str(list(group).index(rule2) + 1) + ','
-            links[rule1] = links[rule1][:-1]
-    rules = []
-    att = list(links.keys())[0].attributes
-    for rule in links.keys():
-        items = rule.variable_items.union(rule.invariable_items)
-        antecedent = tuple(sorted(items))
-        # transform antecedent and consequent into sets
-        antecedent_set = set(antecedent)
-        consequent_str = rule.class_name
-        consequent_set = set([consequent_str])
-        antecedent_str = ''
-        for el in antecedent:
-            antecedent_str += el + ','
-        antecedent_str = antecedent_str[:-1]
-        a_rule = {constants.LHS: antecedent_str, constants.RHS: consequent_str,
-                  constants.LHS_SET: antecedent_set, constants.RHS_SET: consequent_set,
-                  constants.LHS_SUPP_COUNT: rule.antecedent_count,
-                  constants.RULE_SUPP_COUNT: rule.rule_count,
-                  constants.LHS_SUPP: float(rule.antecedent_count)
-                                      / transaction_manager.num_transaction,
-                  constants.RULE_SUPP: float(
-                      rule.rule_count) / transaction_manager.num_transaction,
-                  constants.RULE_CONF: rule.confidence,
-                  constants.LINKS: links[rule]}
-        if rule.attributes != att:
-            att = rule.attributes
+        if rules:
             rules.append(set())
-        rules.append(a_rule)
+        paired_positions = sorted(group_links)
+        link_positions = {}
+        for rule_pos in paired_positions:
+            link_positions[rule_pos] = len(link_positions) + 1
+        for rule_pos in paired_positions:
+            links = ','.join(str(link_positions[link_pos]) for link_pos in sorted(group_links[rule_pos]))
+            rules.append(form_rule(group[rule_pos], links, transaction_manager))
     return rules
 
 
+def get_pair_links(group):
+    """
+    Returns a dictionary of the positions of the rules of group that form a contrasting pair
+    and the positions of their pairs.
+    Rules are keyed by their invariable items and class, and joined across the classes only:
+    1. classes are different
+    2. invariant attributes should have the same values
+    3. if no invariant attributes, at least 1 varying attribute should have the same values
+
+    Arguments:
+        group -- A list of the OrderedStatistic instances of an attribute signature.
+    """
+    buckets = {}
+    for rule_pos, rule in enumerate(group):
+        buckets.setdefault(rule.invariable_items, {}).setdefault(rule.class_name, []).append(rule_pos)
+    links = {}
+    for invariable_items, class_buckets in buckets.items():
+        if len(class_buckets) < 2:
+            continue
+        if invariable_items:
+            # every rule is a pair of all the rules of the other classes
+            for class_name, positions in class_buckets.items():
+                other_positions = [pos for other_class, other_class_positions in class_buckets.items()
+                                   if other_class != class_name for pos in other_class_positions]
+                for rule_pos in positions:
+                    links[rule_pos] = other_positions
+            continue
+        # the rules of the other classes are joined on their variable items
+        item_buckets = {}
+        for class_name, positions in class_buckets.items():
+            for rule_pos in positions:
+                for item in group[rule_pos].variable_items:
+                    item_buckets.setdefault(item, {}).setdefault(class_name, []).append(rule_pos)
+        for class_name, positions in class_buckets.items():
+            for rule_pos in positions:
+                rule_links = set()
+                for item in group[rule_pos].variable_items:
+                    for other_class, other_class_positions in item_buckets[item].items():
+                        if other_class != class_name:
+                            rule_links.update(other_class_positions)
+                if rule_links:
+                    links[rule_pos] = rule_links
+    return links
+
+
+def form_rule(rule, links, transaction_manager):
+    """
+    Returns the dictionary of an OrderedStatistic with decoded antecedent and consequent.
+
+    Arguments:
+        rule -- An OrderedStatistic instance.
+        links -- The positions of the pairs of the rule as a string.
+        transaction_manager -- Transactions as a TransactionManager instance.
+    """
+    item_dictionary = transaction_manager.item_dictionary
+    items = rule.variable_items.union(rule.invariable_items)
+    # decode the item ids of antecedent and consequent
+    antecedent = item_dictionary.decode_items(items)
+    # transform antecedent and consequent into sets
+    antecedent_set = set(antecedent)
+    consequent_str = item_dictionary.decode(rule.class_name)
+    consequent_set = set([consequent_str])
+    antecedent_str = ','.join(antecedent)
+    return {constants.LHS: antecedent_str, constants.RHS: consequent_str,
+            constants.LHS_SET: antecedent_set, constants.RHS_SET: consequent_set,
+            constants.LHS_SUPP_COUNT: rule.antecedent_count,
+            constants.RULE_SUPP_COUNT: rule.rule_count,
+            constants.LHS_SUPP: float(rule.antecedent_count)
+                                / transaction_manager.num_transaction,
+            constants.RULE_SUPP: float(
+                rule.rule_count) / transaction_manager.num_transaction,
+            constants.RULE_CONF: rule.confidence,
+            constants.LINKS: links}
+
+
 def load_base(location, delimiter):
     data = pd.read_csv(location, delimiter=delimiter, header=None)
     return data
@@ -502,10 +823,3 @@ def format(x):
             l.append(t)
     return frozenset(l)
 
-
-def attributes(itemset):
-    res = set()
-    for item in itemset:
-        res.add(item[:2])
-    return res
-
@@ -4,17 +4,20 @@ import time
 
 sys.path.insert(0, '../util')
 import util_functions
+from item_dictionary import census_attribute_of
 
 
-def run(transactions_file_name, min_supp_count, min_conf, output_file_name=None):
+def run(transactions_file_name, min_supp_count, min_conf, output_file_name=None, workers=None):
 
-    transactions = util_functions.unzip_transactions_2(transactions_file_name)
     classifier = ['NO', 'YES']
+    transactions = util_functions.unzip_encoded_transactions(transactions_file_name, classifier,
+                                                             attribute_of=census_attribute_of)
     inv = {"06", "07", "08", "09", "10", "11"}
     var = {"01", "02", "03", "12"}
     start = time.time()
     contrast_rules = scr.generate_contrasting_rules(transactions, classifier, inv, var,
-                                                    min_support=min_supp_count, min_confidence=min_conf)
+                                                    min_support=min_supp_count, min_confidence=min_conf,
+                                                    workers=workers, attribute_of=transactions.item_dictionary.attribute_id)
     end = time.time()
     print('Total elapsed {}'.format((end - start)))
     if output_file_name is not None:
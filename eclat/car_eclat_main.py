@@ -0,0 +1,46 @@
+import eclat
+import sys
+import time
+
+sys.path.insert(0, '../util')
+import util_functions
+from item_dictionary import census_attribute_of
+
+
+def run(transactions_file_name, min_supp_count, min_conf, possible_class_values, diffsets=False,
+        output_file_name=None):
+
+    transactions = util_functions.unzip_encoded_transactions(transactions_file_name, possible_class_values,
+                                                             attribute_of=census_attribute_of)
+    start = time.time()
+    patterns = eclat.find_frequent_class_patterns(transactions, min_supp_count, possible_class_values,
+                                                  diffsets=diffsets,
+                                                  attribute_of=transactions.item_dictionary.attribute_id)
+    rules = eclat.generate_classification_rules(patterns, min_conf, transactions.num_transaction,
+                                                 transactions.item_dictionary)
+    end = time.time()
+    print('Total elapsed {}'.format((end - start)))
+    if output_file_name is not None:
+        print('Saving results to {}'.format(output_file_name))
+        rules_str = util_functions.rules_to_string(rules)
+        with open(output_file_name, 'w') as output_file:
+            output_file.write(rules_str)
+    else:
+        rules_str = util_functions.rules_to_string(rules)
+        print("\nPatterns")
+        print(rules_str)
+
+
+if __name__ == '__main__':
+    path_name = '../data/'
+    transactions_file_name = 'toMine_1_1.txt'
+    min_supp_count = 100
+    min_conf = 0.7
+    possible_class_values = ["YES", "NO"]
+    # census data is dense, diffsets are smaller than tidsets there
+    diffsets = True
+    output_file_name = '../results/car_eclat/{}_supp_{}_conf_{}.txt'.\
+        format(transactions_file_name[:transactions_file_name.find('.txt')], min_supp_count,
+               str(min_conf).replace('.', ''))
+    run(path_name + transactions_file_name, min_supp_count, min_conf, possible_class_values, diffsets,
+        output_file_name)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+
+"""
+an implementation of the Eclat algorithm and of its diffset variant (dEclat) by Python.
+"""
+
+import sys
+from itertools import combinations
+sys.path.insert(0, '../util')
+import constants
+from item_dictionary import EncodedTransactions
+from item_dictionary import decode
+from item_dictionary import decode_items
+from transaction_index import TransactionIndex
+from transaction_index import weighted_popcount
+
+
+################################################################################
+# Inner functions.
+################################################################################
+def class_counts(bitmap, class_masks, weight_masks=None):
+    """
+    Returns the number of transactions of bitmap in every class as a tuple.
+
+    Arguments:
+        bitmap -- A transaction bitmap (int).
+        class_masks -- The transaction bitmaps of the classes or None for a single class.
+        weight_masks -- The (weight, bitmap) pairs of the weighted transactions
+                        or None if every transaction weighs 1.
+    """
+    if class_masks is None:
+        return (weighted_popcount(bitmap, weight_masks),)
+    return tuple(weighted_popcount(bitmap & class_mask, weight_masks) for class_mask in class_masks)
+
+
+def gen_frequent_itemsets(item_bitmaps, min_support, **kwargs):
+    """
+    Returns a generator of (items, counts) for every itemset frequent on at least one class,
+    mined depth first on the vertical layout of the transactions.
+    items is a tuple in the mining order, counts a tuple with one count per class.
+
+    Arguments:
+        item_bitmaps -- A dictionary of the transaction bitmaps of the items.
+        min_support -- A minimum support count.
+
+    Keyword arguments:
+        class_masks -- The transaction bitmaps of the classes or None for a single class.
+        weight_masks -- The (weight, bitmap) pairs of the weighted transactions
+                        or None if every transaction weighs 1.
+        diffsets -- Extend the itemsets with diffsets instead of tidsets (boolean).
+        attribute_of -- A function returning the attribute of an item or None.
+                        If given, two values of the same attribute are never combined.
+        max_length -- The maximum length of the itemsets (integer).
+    """
+    class_masks = kwargs.get('class_masks')
+    weight_masks = kwargs.get('weight_masks')
+    diffsets = kwargs.get('diffsets', False)
+    attribute_of = kwargs.get('attribute_of')
+    max_length = kwargs.get('max_length')
+
+    # Mine the items in ascending order of support, so the equivalence classes
+    # of the frequent items stay small.
+    members = []
+    for item, bitmap in item_bitmaps.items():
+        counts = class_counts(bitmap, class_masks, weight_masks)
+        if max(counts) >= min_support:
+            members.append((item, bitmap, counts))
+    members.sort(key=lambda member: (max(member[2]), member[0]))
+
+    return _gen_equivalence_class((), members, True, min_support, class_masks, weight_masks, diffsets, attribute_of,
+                                  max_length)
+
+
+def _gen_equivalence_class(prefix, members, is_tidset, min_support, class_masks, weight_masks, diffsets,
+                           attribute_of, max_length):
+    """
+    Yields the itemsets of an equivalence class and mines its extensions.
+
+    members are (item, bitmap, counts) of prefix + (item,), bitmap is a tidset if is_tidset
+    and otherwise the diffset of prefix + (item,) with respect to prefix.
+    """
+    for pos, (item, bitmap, counts) in enumerate(members):
+        items = prefix + (item,)
+        yield items, counts
+        if max_length and len(items) >= max_length:
+            continue
+
+        if attribute_of is not None:
+            attribute = attribute_of(item)
+        extensions = []
+        for other_item, other_bitmap, other_counts in members[pos + 1:]:
+            if attribute_of is not None and attribute_of(other_item) == attribute:
+                continue
+            if not diffsets:
+                # t(PXY) = t(PX) & t(PY)
+                ext_bitmap = bitmap & other_bitmap
+                ext_counts = class_counts(ext_bitmap, class_masks, weight_masks)
+            else:
+                if is_tidset:
+                    # d(XY) = t(X) - t(Y)
+                    ext_bitmap = bitmap & ~other_bitmap
+                else:
+                    # d(PXY) = d(PY) - d(PX)
+                    ext_bitmap = other_bitmap & ~bitmap
+                # supp(PXY) = supp(PX) - |d(PXY)|
+                ext_counts = tuple(count - lost for count, lost in zip(counts, class_counts(ext_bitmap, class_masks,
+                                                                                           weight_masks)))
+            if max(ext_counts) >= min_support:
+                extensions.append((other_item, ext_bitmap, ext_counts))
+
+        if extensions:
+            for itemset in _gen_equivalence_class(items, extensions, not diffsets, min_support, class_masks,
+                                                  weight_masks, diffsets, attribute_of, max_length):
+                yield itemset
+
+
+def build_vertical_layout(transactions, class_values=None):
+    """
+    Returns the bitmaps of the items of transactions, the bitmaps of the class values
+    and the weight masks of the transactions.
+    The class values are not part of the returned items.
+
+    Arguments:
+        transactions -- A transaction iterable object or an EncodedTransactions instance.
+        class_values -- The class values found in transactions or None.
+    """
+    transaction_index = TransactionIndex()
+    if isinstance(transactions, EncodedTransactions):
+        for transaction, weight in transactions.weighted():
+            transaction_index.add_transaction(transaction, weight)
+    else:
+        for transaction in transactions:
+            transaction_index.add_transaction(transaction)
+    bitmaps = dict(transaction_index.bitmaps)
+    if class_values is None:
+        return bitmaps, None, transaction_index.weight_masks
+    class_masks = [bitmaps.pop(class_val, 0) for class_val in class_values]
+    return bitmaps, class_masks, transaction_index.weight_masks
+
+
+def sort_patterns(patterns):
+    """
+    Returns the itemsets of patterns in the level-wise order of apriori.
+    """
+    return sorted(patterns, key=lambda itemset: (len(itemset), itemset))
+
+
+################################################################################
+# API function.
+################################################################################
+def find_frequent_patterns(transactions, support_threshold, **kwargs):
+    """
+    Given a set of transactions, find the patterns in it
+    over the specified support threshold: a dictionary {(sorted items): support count}.
+    If the transactions are EncodedTransactions, the patterns are formed of item ids.
+
+    Keyword arguments:
+        diffsets -- Use dEclat, faster on dense transactions (boolean).
+        attribute_of -- A function returning the attribute of an item: two values of
+                        an attribute are never combined (default: None, any items are combined).
+        max_length -- The maximum length of the patterns (integer).
+    """
+    item_bitmaps, _, weight_masks = build_vertical_layout(transactions)
+    patterns = {}
+    for items, counts in gen_frequent_itemsets(item_bitmaps, support_threshold, weight_masks=weight_masks, **kwargs):
+        patterns[tuple(sorted(items))] = counts[0]
+    return patterns
+
+
+def find_frequent_class_patterns(transactions, support_threshold, possible_class_values, **kwargs):
+    """
+    Given a set of transactions, find the patterns without class values in it
+    that are over the specified support threshold on at least one class:
+    a dictionary {(sorted items): {class value: support count}}.
+    If the transactions are EncodedTransactions, the patterns and classes are formed of item ids.
+
+    Keyword arguments:
+        diffsets -- Use dEclat, faster on dense transactions (boolean).
+        attribute_of -- A function returning the attribute of an item: two values of
+                        an attribute are never combined (default: None, any items are combined).
+        max_length -- The maximum length of the patterns (integer).
+    """
+    if isinstance(transactions, EncodedTransactions):
+        item_dictionary = transactions.item_dictionary
+        possible_class_values = [item_dictionary.encode(class_val) for class_val in possible_class_values]
+    item_bitmaps, class_masks, weight_masks = build_vertical_layout(transactions, possible_class_values)
+    patterns = {}
+    for items, counts in gen_frequent_itemsets(item_bitmaps, support_threshold, class_masks=class_masks,
+                                               weight_masks=weight_masks, **kwargs):
+        patterns[tuple(sorted(items))] = dict(zip(possible_class_values, counts))
+    return patterns
+
+
+def generate_association_rules(transactions, min_support, **kwargs):
+    """
+    Executes Eclat algorithm and returns the same rules as apriori.generate_association_rules:
+    one rule for every (k-1)-subset of every frequent k-itemset.
+
+    Arguments:
+        transactions -- A transaction iterable object
+                        (eg. [['A', 'B'], ['B', 'C']])
+                        or an EncodedTransactions instance.
+        min_support -- The minimum support count of relations.
+
+    Keyword arguments:
+        min_confidence -- The minimum confidence of relations (float).
+        diffsets -- Use dEclat, faster on dense transactions (boolean).
+        attribute_of -- A function returning the attribute of an item id, for transactions holding
+                        one value per attribute: two values of an attribute are never combined
+                        (default: None, any items are combined).
+    """
+    min_confidence = kwargs.get('min_confidence', 0.5)
+    diffsets = kwargs.get('diffsets', False)
+    attribute_of = kwargs.get('attribute_of')
+
+    # Check arguments.
+    if min_support <= 0:
+        raise ValueError('minimum support must be > 0')
+
+    transactions = EncodedTransactions.create(transactions)
+    item_dictionary = transactions.item_dictionary
+    num_transaction = transactions.num_transaction
+    patterns = find_frequent_patterns(transactions, min_support, diffsets=diffsets, attribute_of=attribute_of)
+
+    rules = []
+    for itemset in sort_patterns(patterns):
+        rule_support = patterns[itemset]
+        # every subset of a frequent itemset is frequent, so its support is known
+        for items_base in combinations(itemset, len(itemset) - 1):
+            if not items_base:
+                continue
+            antecedent_support = patterns[items_base]
+            confidence = float(rule_support) / antecedent_support
+            if confidence < min_confidence:
+                continue
+            # decode the item ids of antecedent and consequent
+            antecedent = item_dictionary.decode_items(items_base)
+            antecedent_set = set(antecedent)
+            consequent = item_dictionary.decode_items(set(itemset).difference(items_base))
+            consequent_set = set(consequent)
+            a_rule = {constants.LHS: ','.join(antecedent), constants.RHS: ','.join(consequent),
+                      constants.LHS_SET: antecedent_set, constants.RHS_SET: consequent_set,
+                      constants.LHS_SUPP_COUNT: antecedent_support,
+                      constants.RULE_SUPP_COUNT: rule_support,
+                      constants.LHS_SUPP: float(antecedent_support) / num_transaction,
+                      constants.RULE_SUPP: float(rule_support) / num_transaction,
+                      constants.RULE_CONF: confidence, constants.LINKS: ''}
+            rules.append(a_rule)
+    return rules
+
+
+def generate_classification_rules(patterns, confidence_threshold, num_of_transactions, item_dictionary=None):
+    """
+    Given the patterns of find_frequent_class_patterns, return the same classification rules
+    as car_fpgrowth.generate_classification_rules: the antecedent is the pattern
+    and the consequent its most frequent class.
+    if item_dictionary is given, the itemsets and classes are formed of item ids
+    """
+    rules = []
+    for itemset in sort_patterns(patterns):
+        # get most frequent class value and generate a rule for it
+        frequency = patterns[itemset]
+        chosen_class = max(frequency, key=frequency.get)
+        rule_support_count = frequency[chosen_class]
+        tot_support_count = sum(frequency.values())
+        confidence = float(rule_support_count) / tot_support_count
+        if confidence >= confidence_threshold:
+            # form antecedent and consequent as sets and strings
+            antecedent = decode_items(itemset, item_dictionary)
+            consequent_str = decode(chosen_class, item_dictionary)
+            a_rule = {constants.LHS: ','.join(antecedent), constants.RHS: consequent_str,
+                      constants.LHS_SET: set(antecedent), constants.RHS_SET: set([consequent_str]),
+                      constants.LHS_SUPP_COUNT: tot_support_count, constants.RULE_SUPP_COUNT: rule_support_count,
+                      constants.LHS_SUPP: (float(tot_support_count) / num_of_transactions),
+                      constants.RULE_SUPP: (float(rule_support_count) / num_of_transactions),
+                      constants.RULE_CONF: confidence, constants.LINKS: ''}
+            rules.append(a_rule)
+    return rules
@@ -0,0 +1,39 @@
+import eclat
+import sys
+import time
+
+sys.path.insert(0, '../util')
+import util_functions
+from item_dictionary import census_attribute_of
+
+
+def run(transactions_file_name, min_supp_count, min_conf, diffsets=False, output_file_name=None):
+
+    transactions = util_functions.unzip_encoded_transactions(transactions_file_name, attribute_of=census_attribute_of)
+    start = time.time()
+    rules = eclat.generate_association_rules(transactions, min_supp_count, min_confidence=min_conf,
+                                             diffsets=diffsets, attribute_of=transactions.item_dictionary.attribute_id)
+    end = time.time()
+    print('Total elapsed {}'.format((end - start)))
+    if output_file_name is not None:
+        print('Saving results to {}'.format(output_file_name))
+        rules_str = util_functions.rules_to_string(rules)
+        with open(output_file_name, 'w') as output_file:
+            output_file.write(rules_str)
+    else:
+        rules_str = util_functions.rules_to_string(rules)
+        print("\nPatterns")
+        print(rules_str)
+
+
+if __name__ == '__main__':
+    path_name = '../data/'
+    transactions_file_name = 'toMine_3_3.txt'
+    min_supp_count = 100
+    min_conf = 0.6
+    # census data is dense, diffsets are smaller than tidsets there
+    diffsets = True
+    output_file_name = '../results/eclat/{}_supp_{}_conf_{}.txt'.\
+        format(transactions_file_name[:transactions_file_name.find('.txt')], min_supp_count,
+               str(min_conf).replace('.', ''))
+    run(path_name + transactions_file_name, min_supp_count, min_conf, diffsets, output_file_name)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+SCR-patterns mined with Eclat: the support records of SCR-apriori are found depth first
+on the vertical layout and the contrasting rules are formed by SCR-apriori.
+"""
+
+import sys
+sys.path.insert(0, '../util')
+sys.path.insert(0, '../apriori')
+import eclat
+import scr_apriori
+
+
+def gen_support_records(transaction_manager, min_support, **kwargs):
+    """
+    Returns the support records of scr_apriori.gen_support_records, in the same order:
+    the itemsets of length > 1 frequent on at least one class and holding a variable attribute.
+
+    Arguments:
+        transaction_manager -- Transactions as a scr_apriori.TransactionManager instance.
+        min_support -- A minimum support (float).
+
+    Keyword arguments:
+        diffsets -- Use dEclat, faster on dense transactions (boolean).
+        attribute_of -- A function returning the attribute of an item id: two values of
+                        an attribute are never combined (default: None, any items are combined).
+    """
+    diffsets = kwargs.get('diffsets', False)
+    attribute_of = kwargs.get('attribute_of')
+
+    # Lay the transactions of the classes one after the other in a single bitmap per item.
+    item_bitmaps = {}
+    class_masks = []
+    weights = {}
+    offset = 0
+    for class_transaction_index in transaction_manager.class_transaction_indexes:
+        num_rows = class_transaction_index.num_rows
+        for item, bitmap in class_transaction_index.bitmaps.items():
+            item_bitmaps[item] = item_bitmaps.get(item, 0) | (bitmap << offset)
+        for weight, weight_mask in class_transaction_index.weight_masks or [(1, (1 << num_rows) - 1)]:
+            weights[weight] = weights.get(weight, 0) | (weight_mask << offset)
+        class_masks.append(((1 << num_rows) - 1) << offset)
+        offset += num_rows
+    # the bitmaps are only dropped if every transaction weighs 1
+    weight_masks = None if list(weights) == [1] else list(weights.items())
+    for class_item in transaction_manager.classifier:
+        item_bitmaps.pop(class_item, None)
+
+    variable_mask = transaction_manager.variable_mask
+    supports = {}
+    for items, counts in eclat.gen_frequent_itemsets(item_bitmaps, min_support, class_masks=class_masks,
+                                                     weight_masks=weight_masks, diffsets=diffsets,
+                                                     attribute_of=attribute_of):
+        if len(items) < 2:
+            continue
+        # Exclude candidates whith no variable attributes
+        if not transaction_manager.attribute_mask(items) & variable_mask:
+            continue
+        supports[tuple(sorted(items))] = counts
+
+    for itemset in eclat.sort_patterns(supports):
+        yield scr_apriori.SupportRecord(frozenset(itemset), supports[itemset])
+
+
+def generate_contrasting_rules(transactions, classifier, inv, var, min_support, **kwargs):
+    """
+    Executes SCR-Eclat and returns the same rules as scr_apriori.generate_contrasting_rules.
+
+    Keyword arguments:
+        min_confidence -- The minimum confidence of relations (float).
+        diffsets -- Use dEclat, faster on dense transactions (boolean).
+        attribute_of -- A function returning the attribute of an item id: two values of
+                        an attribute are never combined (default: None, any items are combined).
+    """
+    diffsets = kwargs.pop('diffsets', False)
+
+    def _gen_support_records(transaction_manager, min_support, **kwargs):
+        return gen_support_records(transaction_manager, min_support, diffsets=diffsets, **kwargs)
+
+    return scr_apriori.generate_contrasting_rules(transactions, classifier, inv, var, min_support,
+                                                  _gen_support_records=_gen_support_records, **kwargs)
@@ -0,0 +1,101 @@
+import fpgrowth
+import car_fpgrowth
+import scr_fpgrowth
+import random
+import sys
+import time
+
+sys.path.insert(0, '../util')
+import util_functions
+from item_dictionary import census_attribute_of
+
+
+def time_build(build, transactions, repeat=3):
+    """
+    Returns the best time of building a tree over transactions.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        build(transactions)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def synthetic_transactions(transactions, num_transactions, seed=0):
+    """
+    Returns num_transactions transactions whose attribute values are drawn independently
+    from the values observed in transactions. Unlike repeated transactions, they keep
+    adding new branches, so the tree grows with their number.
+    """
+    item_dictionary = transactions.item_dictionary
+    attribute_values = {}
+    for transaction in transactions:
+        for item in transaction:
+            attribute_values.setdefault(item_dictionary.attribute_id(item), []).append(item)
+    attributes = sorted(attribute_values)
+    generator = random.Random(seed)
+    return [[generator.choice(attribute_values[attribute]) for attribute in attributes]
+            for _ in range(num_transactions)]
+
+
+def get_transactions_info(item_dictionary, inv, var, class_values):
+    """
+    Returns the encoded transactions_info of scr_fpgrowth with the values of every attribute.
+    """
+    transactions_info = {'inv': {'order': inv}, 'var': {'order': var},
+                         'class': class_values}
+    for att_type, attributes in (('inv', inv), ('var', var)):
+        for att in attributes:
+            transactions_info[att_type][att] = []
+    for item_id in range(item_dictionary.num_items):
+        for att_type, attributes in (('inv', inv), ('var', var)):
+            att = item_dictionary.attribute_code(item_id)
+            if att in attributes:
+                transactions_info[att_type][att].append(item_id)
+    return transactions_info
+
+
+def run(transactions_file_name, min_supp_count, possible_class_values, scales):
+    """
+    Print the tree construction times of the three FP-trees over synthetic transactions
+    scales times as many as in the file. With O(1) child lookup and header appends,
+    the time per transaction stays flat.
+    """
+    transactions = util_functions.unzip_encoded_transactions(transactions_file_name, possible_class_values,
+                                                             attribute_of=census_attribute_of)
+    item_dictionary = transactions.item_dictionary
+    class_values = [item_dictionary.encode(class_val) for class_val in possible_class_values]
+    inv = ["06", "07", "08", "09", "10", "11"]
+    var = ["01", "02", "03", "12"]
+
+    builders = [
+        ('fpgrowth', lambda a_transactions: fpgrowth.FPTree(a_transactions, min_supp_count, None, None)),
+        ('car_fpgrowth', lambda a_transactions: car_fpgrowth.FPTree(a_transactions, min_supp_count,
+                                                                    class_values, None, None)),
+    ]
+    print('tree\ttransactions\tseconds\tmicroseconds per transaction')
+    for name, build in builders:
+        for scale in scales:
+            scaled = synthetic_transactions(transactions, scale * len(transactions))
+            elapsed = time_build(build, scaled)
+            print('{}\t{}\t{:.4f}\t{:.2f}'.format(name, len(scaled), elapsed, elapsed * 1e6 / len(scaled)))
+
+    transactions_info = get_transactions_info(item_dictionary, inv, var, class_values)
+    for scale in scales:
+        scaled = synthetic_transactions(transactions, scale * len(transactions))
+        elapsed = time_build(
+            lambda a_transactions: scr_fpgrowth.FPTree(a_transactions, transactions_info, item_dictionary),
+            scaled)
+        print('{}\t{}\t{:.4f}\t{:.2f}'.format('scr_fpgrowth', len(scaled), elapsed, elapsed * 1e6 / len(scaled)))
+
+
+if __name__ == '__main__':
+    path_name = '../data/'
+    transactions_file_name = 'toMine_1_1.txt'
+    min_supp_count = 1
+    possible_class_values = ["YES", "NO"]
+    scales = [1, 2, 4, 8]
+    run(path_name + transactions_file_name, min_supp_count, possible_class_values, scales)
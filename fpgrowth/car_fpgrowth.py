@@ -3,6 +3,9 @@ import sys
 
 sys.path.insert(0, '../util')
 import constants
+from item_dictionary import EncodedTransactions
+from item_dictionary import decode
+from item_dictionary import decode_items
 
 
 class UtilClass(object):
@@ -37,8 +40,11 @@ class UtilClass(object):
 class FPNode(object):
     """
     A node in the FP tree.
+    Children are kept in a dictionary keyed by their values.
     """
 
+    __slots__ = ('value', 'count', 'parent', 'link', 'children')
+
     def __init__(self, value, count, current_class, possible_class_values, parent):
         """
         Create the node.
@@ -58,34 +64,27 @@ class FPNode(object):
                 self.count[current_class] = count
         self.parent = parent
         self.link = None
-        self.children = []
+        self.children = {}
 
     def has_child(self, value):
         """
         Check if node has a particular child node.
         """
-        for node in self.children:
-            if node.value == value:
-                return True
-
-        return False
+        return value in self.children
 
     def get_child(self, value):
         """
         Return a child node with a particular value.
         """
-        for node in self.children:
-            if node.value == value:
-                return node
+        return self.children.get(value)
 
-        return None
-
-    def add_child(self, value, current_class, possible_class_values):
+    def add_child(self, value, class_counts, possible_class_values):
         """
         Add a node as a child node.
+        class_counts is a dictionary with the count of every class value.
         """
-        child = FPNode(value, 1, current_class, possible_class_values, self)
-        self.children.append(child)
+        child = FPNode(value, class_counts, None, possible_class_values, self)
+        self.children[value] = child
         return child
 
 
@@ -94,25 +93,32 @@ class FPTree(object):
     A frequent pattern tree.
     """
 
-    def __init__(self, transactions, threshold, possible_class_values, root_value, root_count):
+    def __init__(self, transactions, threshold, possible_class_values, root_value, root_count, weighted=False):
         """
         Initialize the tree.
+        If weighted, transactions are (items, class counts) pairs, where the items hold no class value
+        and the class counts are a dictionary with the count of every class value.
+        Every pair is inserted once with its class counts.
         """
+        if not weighted:
+            transactions = self.weight_transactions(transactions, possible_class_values)
         self.frequent = self.find_frequent_items(transactions, possible_class_values, threshold)
         self.headers = self.build_header_table(self.frequent)
+        # the last node linked to every header, so new nodes are appended in O(1)
+        self.tails = {}
         self.possible_class_values = possible_class_values
         self.root = self.build_fptree(
             transactions, root_value, root_count,
             self.frequent, self.headers, possible_class_values)
 
     @staticmethod
-    def find_frequent_items(transactions, possible_class_values, threshold):
+    def weight_transactions(transactions, possible_class_values, weights=None):
         """
-        Create a dictionary of items with occurrences above the threshold.
+        Returns transactions as (items, class counts) pairs with a count on their class value
+        of their weight, or 1 if weights is None.
         """
-        items = {}
-
-        for transaction in transactions:
+        weighted_transactions = []
+        for pos, transaction in enumerate(transactions):
             # first find the class value
             current_class = None
             for class_val in possible_class_values:
@@ -122,19 +128,29 @@ class FPTree(object):
             if current_class is None:
                 raise Exception("Transaction has no class value: {}".format(transaction))
 
+            class_counts = {}
+            for class_val in possible_class_values:
+                class_counts[class_val] = 0
+            class_counts[current_class] = 1 if weights is None else weights[pos]
+            weighted_transactions.append(([item for item in transaction if item != current_class], class_counts))
+        return weighted_transactions
+
+    @staticmethod
+    def find_frequent_items(transactions, possible_class_values, threshold):
+        """
+        Create a dictionary of items with occurrences above the threshold.
+        transactions are (items, class counts) pairs.
+        """
+        items = {}
+
+        for transaction, class_counts in transactions:
             for item in transaction:
-                if item == current_class:
-                    continue
                 if item in items:
-                    items[item][current_class] += 1
-                else:
-                    item_info = {}
+                    item_info = items[item]
                     for class_val in possible_class_values:
-                        if class_val == current_class:
-                            item_info[class_val] = 1
-                        else:
-                            item_info[class_val] = 0
-                    items[item] = item_info
+                        item_info[class_val] += class_counts[class_val]
+                else:
+                    items[item] = dict(class_counts)
 
         for key in list(items.keys()):
             # now delete those, that are frequent on none of the classes
@@ -164,60 +180,49 @@ class FPTree(object):
                      frequent, headers, possible_class_values):
         """
         Build the FP tree and return the root node.
+        transactions are (items, class counts) pairs.
         """
         root = FPNode(root_value, root_count, None, possible_class_values, None)
 
-        for transaction in transactions:
-            # initialize class object
-            current_class = None
-            for class_val in possible_class_values:
-                if class_val in transaction:
-                    # current_class is found
-                    current_class = class_val
-                    # remove class element from items
-                    # transaction.remove(current_class)
-                    break
-            if current_class is None:
-                raise Exception("Transaction has no class value: {}".format(transaction))
-
-            sorted_items = [x for x in transaction if x in frequent.keys()]
+        for transaction, class_counts in transactions:
+            sorted_items = [x for x in transaction if x in frequent]
             if len(sorted_items) > 0:
                 sorted_items.sort(key=lambda x: max(frequent[x].values()), reverse=True)
-                self.insert_tree(sorted_items, root, headers, possible_class_values, current_class)
+                self.insert_tree(sorted_items, root, headers, possible_class_values, class_counts)
 
         if root_count is None:
             # now update root class values if it is an original tree
-            for a_child in root.children:
+            for a_child in root.children.values():
                 for class_val in possible_class_values:
                     root.count[class_val] += a_child.count[class_val]
 
         return root
 
-    def insert_tree(self, items, node, headers, possible_class_values, current_class):
+    def insert_tree(self, items, node, headers, possible_class_values, class_counts):
         """
         Recursively grow FP tree.
+        class_counts is a dictionary with the count of every class value.
         """
         first = items[0]
         child = node.get_child(first)
         if child is not None:
-            child.count[current_class] += 1
+            for class_val in possible_class_values:
+                child.count[class_val] += class_counts[class_val]
         else:
             # Add new child.
-            child = node.add_child(first, current_class, possible_class_values)
+            child = node.add_child(first, class_counts, possible_class_values)
 
             # Link it to header structure.
             if headers[first] is None:
                 headers[first] = child
             else:
-                current = headers[first]
-                while current.link is not None:
-                    current = current.link
-                current.link = child
+                self.tails[first].link = child
+            self.tails[first] = child
 
         # Call function recursively.
         remaining_items = items[1:]
         if len(remaining_items) > 0:
-            self.insert_tree(remaining_items, child, headers, possible_class_values, current_class)
+            self.insert_tree(remaining_items, child, headers, possible_class_values, class_counts)
 
     def tree_has_single_path(self, node):
         """
@@ -230,7 +235,7 @@ class FPTree(object):
         elif num_children == 0:
             return True
         else:
-            return True and self.tree_has_single_path(node.children[0])
+            return True and self.tree_has_single_path(next(iter(node.children.values())))
 
     def mine_patterns(self, threshold):
         """
@@ -304,6 +309,7 @@ class FPTree(object):
 
             # For each occurrence of the item,
             # trace the path back to the root node.
+            # The path is added once, weighted by the class counts of the occurrence.
             for suffix in suffixes:
                 frequency = suffix.count
                 path = []
@@ -313,16 +319,12 @@ class FPTree(object):
                     path.append(parent.value)
                     parent = parent.parent
 
-                for class_val in self.possible_class_values:
-                    path_with_class = path[:]
-                    path_with_class.append(class_val)
-                    for i in range(frequency[class_val]):
-                        conditional_tree_input.append(path_with_class)
+                conditional_tree_input.append((path, frequency))
 
             # Now we have the input for a subtree,
             # so construct it and grab the patterns.
             subtree = FPTree(conditional_tree_input, threshold, self.possible_class_values,
-                             item, item_frequency)
+                             item, item_frequency, weighted=True)
             # print(subtree.to_string())
             subtree_patterns = subtree.mine_patterns(threshold)
 
@@ -361,7 +363,7 @@ class FPTree(object):
 
         children_str = ''
         if is_add_children:
-            for child_node in node.children:
+            for child_node in node.children.values():
                 children_str += '\n\t' + tabs_str + self.node_to_string(child_node, tab_count+1, True)
 
         return node_str + children_str
@@ -371,17 +373,27 @@ def find_frequent_patterns(transactions, support_threshold, possible_class_value
     """
     Given a set of transactions, find the patterns in it
     over the specified support threshold.
+    If the transactions are EncodedTransactions, the patterns are formed of item ids
+    and the transactions are inserted with their weights.
     """
-    tree = FPTree(transactions, support_threshold, possible_class_values, None, None)
+    if isinstance(transactions, EncodedTransactions):
+        item_dictionary = transactions.item_dictionary
+        possible_class_values = [item_dictionary.encode(class_val) for class_val in possible_class_values]
+        weighted_transactions = FPTree.weight_transactions(transactions, possible_class_values, transactions.weights)
+        tree = FPTree(weighted_transactions, support_threshold, possible_class_values, None, None, weighted=True)
+    else:
+        tree = FPTree(transactions, support_threshold, possible_class_values, None, None)
     # print(tree.to_string())
     return tree.mine_patterns(support_threshold)
 
 
-def generate_classification_rules(patterns, confidence_threshold, num_of_transactions, class_values):
+def generate_classification_rules(patterns, confidence_threshold, num_of_transactions, class_values,
+                                  item_dictionary=None):
     """
     Given a set of frequent itemsets, return a dict
     of association rules in the form
     {(left): ((right), confidence)}
+    if item_dictionary is given, the itemsets and classes are formed of item ids
     right contains only one item (is and itemset of size 1)
     """
     rules = []
@@ -397,13 +409,13 @@ def generate_classification_rules(patterns, confidence_threshold, num_of_transac
         confidence = float(rule_support_count) / tot_support_count
         if confidence >= confidence_threshold:
             # form antecedent and consequent as sets and strings
-            antecedent = tuple(sorted(itemset))
+            antecedent = decode_items(itemset, item_dictionary)
             antecedent_set = set(antecedent)
             antecedent_str = ''
             for el in antecedent:
                 antecedent_str += el + ','
             antecedent_str = antecedent_str[:-1]
-            consequent_str = chosen_class
+            consequent_str = decode(chosen_class, item_dictionary)
             consequent_set = set([consequent_str])
 
             a_rule = {constants.LHS: antecedent_str, constants.RHS: consequent_str,
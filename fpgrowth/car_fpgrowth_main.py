@@ -8,11 +8,14 @@ import util_functions
 
 def run(transactions_file_name, min_supp_count, min_conf, possible_class_values, output_file_name=None):
 
-    transactions = util_functions.unzip_transactions_2(transactions_file_name)
+    transactions = util_functions.unzip_encoded_transactions(transactions_file_name, possible_class_values,
+                                                             deduplicate=True)
     start = time.time()
     patterns = car_fpgrowth.find_frequent_patterns(transactions, min_supp_count, possible_class_values)
     #rules = car_fpgrowth.generate_association_rules_with_one_item_consequent(patterns, min_conf, len(transactions))
-    rules = car_fpgrowth.generate_classification_rules(patterns, min_conf, len(transactions), possible_class_values)
+    rules = car_fpgrowth.generate_classification_rules(patterns, min_conf, transactions.num_transaction,
+                                                       possible_class_values,
+                                                       transactions.item_dictionary)
     end = time.time()
     print('Total elapsed {}'.format((end - start)))
     if output_file_name is not None:
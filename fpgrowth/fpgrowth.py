@@ -3,13 +3,18 @@ import sys
 
 sys.path.insert(0, '../util')
 import constants
+from item_dictionary import EncodedTransactions
+from item_dictionary import decode_items
 
 
 class FPNode(object):
     """
     A node in the FP tree.
+    Children are kept in a dictionary keyed by their values.
     """
 
+    __slots__ = ('value', 'count', 'parent', 'link', 'children')
+
     def __init__(self, value, count, parent):
         """
         Create the node.
@@ -18,34 +23,26 @@ class FPNode(object):
         self.count = count
         self.parent = parent
         self.link = None
-        self.children = []
+        self.children = {}
 
     def has_child(self, value):
         """
         Check if node has a particular child node.
         """
-        for node in self.children:
-            if node.value == value:
-                return True
-
-        return False
+        return value in self.children
 
     def get_child(self, value):
         """
         Return a child node with a particular value.
         """
-        for node in self.children:
-            if node.value == value:
-                return node
+        return self.children.get(value)
 
-        return None
-
-    def add_child(self, value):
+    def add_child(self, value, count=1):
         """
         Add a node as a child node.
         """
-        child = FPNode(value, 1, self)
-        self.children.append(child)
+        child = FPNode(value, count, self)
+        self.children[value] = child
         return child
 
 
@@ -54,12 +51,18 @@ class FPTree(object):
     A frequent pattern tree.
     """
 
-    def __init__(self, transactions, threshold, root_value, root_count):
+    def __init__(self, transactions, threshold, root_value, root_count, weighted=False):
         """
         Initialize the tree.
+        If weighted, transactions are (items, count) pairs
+        and every pair is inserted once with its count.
         """
+        if not weighted:
+            transactions = [(transaction, 1) for transaction in transactions]
         self.frequent = self.find_frequent_items(transactions, threshold)
         self.headers = self.build_header_table(self.frequent)
+        # the last node linked to every header, so new nodes are appended in O(1)
+        self.tails = {}
         self.root = self.build_fptree(
             transactions, root_value,
             root_count, self.frequent, self.headers)
@@ -68,15 +71,16 @@ class FPTree(object):
     def find_frequent_items(transactions, threshold):
         """
         Create a dictionary of items with occurrences above the threshold.
+        transactions are (items, count) pairs.
         """
         items = {}
 
-        for transaction in transactions:
+        for transaction, count in transactions:
             for item in transaction:
                 if item in items:
-                    items[item] += 1
+                    items[item] += count
                 else:
-                    items[item] = 1
+                    items[item] = count
 
         for key in list(items.keys()):
             if items[key] < threshold:
@@ -99,42 +103,41 @@ class FPTree(object):
                      root_count, frequent, headers):
         """
         Build the FP tree and return the root node.
+        transactions are (items, count) pairs.
         """
         root = FPNode(root_value, root_count, None)
 
-        for transaction in transactions:
+        for transaction, count in transactions:
             sorted_items = [x for x in transaction if x in frequent]
             sorted_items.sort(key=lambda x: frequent[x], reverse=True)
             if len(sorted_items) > 0:
-                self.insert_tree(sorted_items, root, headers)
+                self.insert_tree(sorted_items, root, headers, count)
 
         return root
 
-    def insert_tree(self, items, node, headers):
+    def insert_tree(self, items, node, headers, count=1):
         """
         Recursively grow FP tree.
         """
         first = items[0]
         child = node.get_child(first)
         if child is not None:
-            child.count += 1
+            child.count += count
         else:
             # Add new child.
-            child = node.add_child(first)
+            child = node.add_child(first, count)
 
             # Link it to header structure.
             if headers[first] is None:
                 headers[first] = child
             else:
-                current = headers[first]
-                while current.link is not None:
-                    current = current.link
-                current.link = child
+                self.tails[first].link = child
+            self.tails[first] = child
 
         # Call function recursively.
         remaining_items = items[1:]
         if len(remaining_items) > 0:
-            self.insert_tree(remaining_items, child, headers)
+            self.insert_tree(remaining_items, child, headers, count)
 
     def tree_has_single_path(self, node):
         """
@@ -147,7 +150,7 @@ class FPTree(object):
         elif num_children == 0:
             return True
         else:
-            return True and self.tree_has_single_path(node.children[0])
+            return True and self.tree_has_single_path(next(iter(node.children.values())))
 
     def mine_patterns(self, threshold):
         """
@@ -222,6 +225,7 @@ class FPTree(object):
 
             # For each occurrence of the item, 
             # trace the path back to the root node.
+            # The path is added once, weighted by the count of the occurrence.
             for suffix in suffixes:
                 frequency = suffix.count
                 path = []
@@ -231,13 +235,12 @@ class FPTree(object):
                     path.append(parent.value)
                     parent = parent.parent
 
-                for i in range(frequency):
-                    conditional_tree_input.append(path)
+                conditional_tree_input.append((path, frequency))
 
             # Now we have the input for a subtree,
             # so construct it and grab the patterns.
             subtree = FPTree(conditional_tree_input, threshold,
-                             item, self.frequent[item])
+                             item, self.frequent[item], weighted=True)
             subtree_patterns = subtree.mine_patterns(threshold)
 
             # Insert subtree patterns into main patterns dictionary.
@@ -273,7 +276,7 @@ class FPTree(object):
 
         children_str = ''
         if is_add_children:
-            for child_node in node.children:
+            for child_node in node.children.values():
                 children_str += '\n\t' + tabs_str + self.node_to_string(child_node, tab_count+1, True)
 
         return node_str + children_str
@@ -283,16 +286,21 @@ def find_frequent_patterns(transactions, support_threshold):
     """
     Given a set of transactions, find the patterns in it
     over the specified support threshold.
+    If the transactions are EncodedTransactions, they are inserted with their weights.
     """
-    tree = FPTree(transactions, support_threshold, None, None)
+    if isinstance(transactions, EncodedTransactions):
+        tree = FPTree(list(transactions.weighted()), support_threshold, None, None, weighted=True)
+    else:
+        tree = FPTree(transactions, support_threshold, None, None)
     return tree.mine_patterns(support_threshold)
 
 
-def generate_association_rules(patterns, confidence_threshold, num_of_transactions):
+def generate_association_rules(patterns, confidence_threshold, num_of_transactions, item_dictionary=None):
     """
     Given a set of frequent itemsets, return a dict
     of association rules in the form
     {(left): ((right), confidence)}
+    if item_dictionary is given, the itemsets are formed of item ids
     """
     rules = []
     for itemset in patterns.keys():
@@ -310,7 +318,12 @@ def generate_association_rules(patterns, confidence_threshold, num_of_transactio
                 confidence = float(upper_support) / lower_support
 
                 if confidence >= confidence_threshold:
-                    # form antecedent and censequent in string format (the tuples are already sorted)
+                    # decode the items of antecedent and consequent (the lists are sorted)
+                    antecedent = decode_items(antecedent, item_dictionary)
+                    antecedent_set = set(antecedent)
+                    consequent = decode_items(consequent, item_dictionary)
+                    consequent_set = set(consequent)
+                    # form antecedent and censequent in string format
                     consequent_str = ''
                     for el in consequent:
                         consequent_str += el + ','
@@ -330,11 +343,12 @@ def generate_association_rules(patterns, confidence_threshold, num_of_transactio
     return rules
 
 
-def generate_association_rules_with_one_item_consequent(patterns, confidence_threshold, num_of_transactions):
+def generate_association_rules_with_one_item_consequent(patterns, confidence_threshold, num_of_transactions, item_dictionary=None):
     """
     Given a set of frequent itemsets, return a dict
     of association rules in the form
     {(left): ((right), confidence)}
+    if item_dictionary is given, the itemsets are formed of item ids
     right contains only one item (is and itemset of size 1)
     """
     rules = []
@@ -354,7 +368,12 @@ def generate_association_rules_with_one_item_consequent(patterns, confidence_thr
                 confidence = float(upper_support) / lower_support
 
                 if confidence >= confidence_threshold:
-                    # form antecedent and censequent in string format (the tuples are already sorted)
+                    # decode the items of antecedent and consequent (the lists are sorted)
+                    antecedent = decode_items(antecedent, item_dictionary)
+                    antecedent_set = set(antecedent)
+                    consequent = decode_items(consequent, item_dictionary)
+                    consequent_set = set(consequent)
+                    # form antecedent and censequent in string format
                     consequent_str = ''
                     for el in consequent:
                         consequent_str += el + ','
@@ -373,13 +392,17 @@ def generate_association_rules_with_one_item_consequent(patterns, confidence_thr
     return rules
 
 
-def generate_classification_rules(patterns, confidence_threshold, num_of_transactions, class_values):
+def generate_classification_rules(patterns, confidence_threshold, num_of_transactions, class_values, item_dictionary=None):
     """
     Given a set of frequent itemsets, return a dict
     of association rules in the form
     {(left): ((right), confidence)}
+    if item_dictionary is given, the itemsets are formed of item ids
     right contains only one item (is and itemset of size 1)
     """
+    if item_dictionary is not None:
+        # patterns are formed of item ids
+        class_values = [item_dictionary.encode(class_val) for class_val in class_values]
     rules = []
     for itemset in patterns.keys():
         if len(itemset) > 1:
@@ -400,7 +423,12 @@ def generate_classification_rules(patterns, confidence_threshold, num_of_transac
                     confidence = float(upper_support) / lower_support
 
                     if confidence >= confidence_threshold:
-                        # form antecedent and censequent in string format (the tuples are already sorted)
+                        # decode the items of antecedent and consequent (the lists are sorted)
+                        antecedent = decode_items(antecedent, item_dictionary)
+                        antecedent_set = set(antecedent)
+                        consequent = decode_items(consequent, item_dictionary)
+                        consequent_set = set(consequent)
+                        # form antecedent and censequent in string format
                         consequent_str = ''
                         for el in consequent:
                             consequent_str += el + ','
@@ -2,9 +2,11 @@ import copy
 import itertools
 import operator
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.insert(0, '../util')
 import constants
+from item_dictionary import EncodedTransactions
 
 CHOSEN_CLASS = 'chosen_class'
 RULE_CONF = 'rule_conf'
@@ -23,8 +25,11 @@ FREQUENT_ON_NONE_CLASSES = -1
 class FPNode(object):
     """
     A node in the FP tree.
+    Children are kept in a dictionary keyed by their values.
     """
 
+    __slots__ = ('value', 'count', 'parent', 'link', 'children')
+
     def __init__(self, value, classes, count_on_class, parent):
         """
         Create the node.
@@ -39,38 +44,76 @@ class FPNode(object):
                 self.count[class_val] = count_on_class[class_val]
         self.parent = parent
         self.link = None
-        self.children = []
+        self.children = {}
 
     def has_child(self, value):
         """
         Check if node has a particular child node.
         """
-        for node in self.children:
-            if node.value == value:
-                return True
-
-        return False
+        return value in self.children
 
     def get_child(self, value):
         """
         Return a child node with a particular value.
         """
-        for node in self.children:
-            if node.value == value:
-                return node
-
-        return None
+        return self.children.get(value)
 
-    def add_child(self, value, class_val, classes):
+    def add_child(self, value, class_val, classes, count=1):
         """
-        Add a node as a child node.
+        Add a node as a child node with count on class_val.
         """
-        count_on_classes = {class_val: 1}
+        count_on_classes = {class_val: count}
         child = FPNode(value, classes, count_on_classes, self)
-        self.children.append(child)
+        self.children[value] = child
         return child
 
 
+class AttributeSchema(object):
+    """
+    The attributes of transactions_info compiled once into dictionaries,
+    so the attribute and the type of a value are found in O(1).
+    """
+
+    def __init__(self, transactions_info):
+        """
+        Initialize.
+
+        Arguments:
+            transactions_info -- A dictionary with the 'inv' and 'var' attributes and their values
+                                 ordered by their 'order' lists, and the 'class' values.
+        """
+        self.value_attribute = {}
+        self.value_type = {}
+        self.attribute_type = {}
+        self.attribute_values = {}
+        self.class_values = list(transactions_info[CLASS])
+        for att_type in (INV, VAR):
+            for att in transactions_info[att_type]['order']:
+                self.attribute_type[att] = att_type
+                self.attribute_values[att] = list(transactions_info[att_type][att])
+                for att_val in transactions_info[att_type][att]:
+                    self.value_attribute[att_val] = att
+                    self.value_type[att_val] = att_type
+
+    def attribute_of(self, value):
+        """
+        Returns the attribute of value or None if value is not an attribute value.
+        """
+        return self.value_attribute.get(value)
+
+    def type_of(self, value):
+        """
+        Returns 'inv' or 'var', the type of the attribute of value or None if value is not an attribute value.
+        """
+        return self.value_type.get(value)
+
+    def attribute_type_of(self, attribute):
+        """
+        Returns 'inv' or 'var', the type of attribute.
+        """
+        return self.attribute_type[attribute]
+
+
 class SCRRuleitem(object):
 
     def __init__(self, inv_values, var_values, class_object):
@@ -114,25 +157,70 @@ class FPTree(object):
     A frequent pattern tree.
     """
 
-    def __init__(self, transactions, transactions_info):
+    def __init__(self, transactions, transactions_info, item_dictionary, weighted=False, schema=None,
+                 label_attributes=()):
         """
         Initialize the tree.
+        Items are item ids of item_dictionary, every transaction holds one class value.
+        If weighted, transactions are (items, count) pairs
+        and every pair is inserted once with its count.
+        schema is the AttributeSchema of the original transactions_info: if not given,
+        it is compiled from transactions_info, whose class values are then replaced by their class labels.
+        Class labels are mixed-radix integers over the values of label_attributes and the class values,
+        see decode_label.
         """
+        if not weighted:
+            transactions = [(transaction, 1) for transaction in transactions]
         # self.frequent = self.find_frequent_items(transactions, threshold)
+        self.item_dictionary = item_dictionary
         self.transactions_info = copy.deepcopy(transactions_info)
+        if schema is None:
+            schema = AttributeSchema(transactions_info)
+            self.transactions_info[CLASS] = list(range(len(schema.class_values)))
+        self.schema = schema
+        # the attributes merged into the class labels, the first is the least significant digit after the class
+        self.label_attributes = list(label_attributes)
+        self.label_radices = [len(schema.class_values)]
+        for att in self.label_attributes:
+            self.label_radices.append(len(schema.attribute_values[att]))
+        # the number of possible class labels
+        self.label_space = 1
+        for radix in self.label_radices:
+            self.label_space *= radix
         self.headers = {}
+        # the last node linked to every header value, so new nodes are appended in O(1)
+        self.tails = {}
         self.sorting_order_per_attribute = []
         self.sorting_order_per_value = []
+        # the position of every value in sorting_order_per_value
+        self.value_ranks = {}
         self.build_header_table_and_sorting_orders()
         self.scr_ruleitems = None
         self.scr_ruleitems_info = None
+        # the label of every scr_ruleitem without its class digit
+        self.scr_ruleitem_labels = None
+        self.scr_groups = None
 
         self.root = self.build_fptree(transactions, self.headers)
         # update class count for root node: set it as sum of counts of its children
-        for child in self.root.children:
-            for class_val in transactions_info["class"]:
+        for child in self.root.children.values():
+            for class_val in self.transactions_info["class"]:
                 self.root.count[class_val] += child.count[class_val]
 
+    def decode_label(self, label):
+        """
+        Returns the values of label_attributes (from the last merged attribute) as a tuple
+        and the class value of the class label.
+        """
+        label, class_pos = divmod(label, self.label_radices[0])
+        values = []
+        for att in self.label_attributes:
+            att_values = self.schema.attribute_values[att]
+            label, value_pos = divmod(label, len(att_values))
+            values.append(att_values[value_pos])
+        values.reverse()
+        return tuple(values), self.schema.class_values[class_pos]
+
     def build_header_table_and_sorting_orders(self):
         headers = {}
         sorting_order_per_attribute = []
@@ -161,6 +249,12 @@ class FPTree(object):
         self.headers = headers
         self.sorting_order_per_attribute = sorting_order_per_attribute
 
+        # the class values of the transactions are sorted last
+        value_ranks = {}
+        for value in sorting_order_per_value + self.schema.class_values:
+            value_ranks.setdefault(value, len(value_ranks))
+        self.value_ranks = value_ranks
+
         for class_val in self.transactions_info["class"]:
             sorting_order_per_value.append(class_val)
         self.sorting_order_per_value = sorting_order_per_value
@@ -168,20 +262,29 @@ class FPTree(object):
     def build_fptree(self, transactions, headers):
         """
         Build the FP tree and return the root node.
+        transactions are (items, count) pairs.
         """
         root = FPNode(None, self.transactions_info["class"], None, None)
+        value_ranks = self.value_ranks
+        class_labels = {}
+        for class_pos, class_val in enumerate(self.schema.class_values):
+            class_labels[class_val] = class_pos
 
-        for transaction in transactions:
-            sorted_items = [x for x in transaction]
+        for transaction, count in transactions:
             #sorted_items.sort(key=lambda x: frequent[x], reverse=True)
-            # sort according to self.sorting_order
-            sorted_items = sorted(sorted_items[:], key=lambda x: self.sorting_order_per_value.index(x))
+            # sort according to self.sorting_order, the ranks are looked up in O(1)
+            sorted_items = sorted(transaction, key=value_ranks.__getitem__)
             if len(sorted_items) > 0:
-                self.insert_tree(sorted_items, root, headers)
+                # the class value is the last item, replace it by its class label
+                class_label = class_labels.get(sorted_items[-1])
+                if class_label is None:
+                    raise Exception("Transaction has no class value: {}".format(transaction))
+                sorted_items[-1] = class_label
+                self.insert_tree(sorted_items, root, headers, count)
 
         return root
 
-    def insert_tree(self, items, node, headers):
+    def insert_tree(self, items, node, headers, count=1):
         """
         Recursively grow FP tree.
         """
@@ -191,97 +294,174 @@ class FPTree(object):
         child = node.get_child(first)
         if child is not None:
             # last attribute is always a class attribute ==> use it to update relative count info
-            child.count[class_val] += 1
+            child.count[class_val] += count
         else:
             # Add new child.
-            child = node.add_child(first, class_val, self.transactions_info["class"])
+            child = node.add_child(first, class_val, self.transactions_info["class"], count)
 
             # Link it to header structure.
-            # Find the position of the required header
-            for header_key in headers.keys():
-                if first in headers[header_key]:
-                    # we are here
-                    header = headers[header_key]
-                    if header[first] is None:
-                        header[first] = child
-                    else:
-                        current = header[first]
-                        while current.link is not None:
-                            current = current.link
-                        current.link = child
-                    break
+            self.link_node(child)
 
         # Call function recursively.
         # exclude the last attribute that is the attribute of class
         remaining_items = items[1:]
         if len(remaining_items) > 1:
-            self.insert_tree(remaining_items, child, headers)
+            self.insert_tree(remaining_items, child, headers, count)
 
     def mine_patterns(self, support_threshold, confidence_threshold, original_transactions_info, tot_records_num, is_verbose=False, not_main_tree=False,
                       list_of_patterns=None):
         if list_of_patterns is None:
             list_of_patterns = []
+        list_of_patterns.extend(self.gen_patterns(support_threshold, confidence_threshold, original_transactions_info,
+                                                  tot_records_num, is_verbose, not_main_tree))
+        return list_of_patterns
 
-        inverse_order_of_attributes = list(reversed(self.sorting_order_per_attribute))
+    def gen_patterns(self, support_threshold, confidence_threshold, original_transactions_info, tot_records_num,
+                     is_verbose=False, not_main_tree=False):
+        """
+        Returns a generator of the patterns of mine_patterns, in the same order:
+        the patterns of a subtree are yielded as soon as it is mined.
+        """
         # now construct reduced pf-trees
+        positions = self.get_mined_positions(not_main_tree)
+        jobs = [(self, i) for i in positions]
+        for patterns in FPTree.gen_scheduled_patterns(jobs, support_threshold, confidence_threshold,
+                                                      original_transactions_info, tot_records_num, is_verbose):
+            yield patterns
+        if len(positions) < len(self.sorting_order_per_attribute):
+            # only invariant attributes left, no need to build new trees
+            if is_verbose:
+                print("====================== Finished iteration =======================")
+
+    def get_mined_positions(self, not_main_tree=False):
+        """
+        Returns the positions in the inverse order of attributes of the attributes that mine_patterns
+        builds subtrees for: all of them in a subtree,
+        the varying attributes before the first invariant one in the main tree.
+        """
+        inverse_order_of_attributes = list(reversed(self.sorting_order_per_attribute))
+        positions = []
         for i in range(0, len(inverse_order_of_attributes)):
             current_att = inverse_order_of_attributes[i]
             # check if current item is invariant
             # if yes, stop building new trees
             if (current_att in self.transactions_info["var"]) or not_main_tree:
-                # build new tree
-                if i == len(inverse_order_of_attributes) - 1:
-                    next_att = None
-                    rest_of_attributes = []
-                else:
-                    next_att = inverse_order_of_attributes[i + 1]
-                    rest_of_attributes = inverse_order_of_attributes[i+2:]
-                if i > 0:
-                    previous_attributes = inverse_order_of_attributes[0:i]
-                else:
-                    previous_attributes = []
-                if is_verbose:
-                    print(str(i) + ": Subtree construction")
-
-                subtree = self.get_subtree(previous_attributes, current_att, next_att, rest_of_attributes)
-                                           # ,self.transactions_info)
-                subtree.init_scr_ruleitems(original_transactions_info)
-                subtree.init_scr_rules()
-                # subtree.get_scr_patterns(support_threshold, confidence_threshold)
-                if is_verbose:
-                    print(str(i) + " done")
-                    print("-------------------------------")
-                    print(subtree.to_string(False, is_add_children=False))
-
-                patterns = subtree.get_scr_patterns_v2(support_threshold, confidence_threshold, tot_records_num)
-                if len(patterns) > 0:
-                    list_of_patterns.append(patterns)
-                #for pattern in patterns:
-                #    list_of_patterns.append(pattern)
-                if is_verbose:
-                    print("SCR-patterns")
-                    print(self.scr_patterns_to_string(patterns))
-
-                pruned_num, left_classes = subtree.prune_tree(support_threshold, original_transactions_info, is_verbose)
-                if is_verbose:
-                    if pruned_num > 0:
-                        print('--Pruned tree--')
-                        print(subtree.to_string(False))
-                # now print the formed patterns
-                # patterns is an array of arrays, each sub-array consists of scr_ruleitems forming scr_pattern
-                if len(subtree.scr_ruleitems_info[VAR]) == 1 and '01' in subtree.scr_ruleitems_info[VAR]\
-                        and len(subtree.scr_ruleitems_info[INV]) == 1 and '07' in subtree.scr_ruleitems_info[INV]:
-                    pass
-                if left_classes > 0:
-                    subtree.mine_patterns(support_threshold, confidence_threshold, original_transactions_info,
-                                          tot_records_num, is_verbose, True, list_of_patterns)
+                positions.append(i)
             else:
-                # only invariant attributes left, no need to build new trees
-                if is_verbose:
-                    print("====================== Finished iteration =======================")
                 break
+        return positions
+
+    def mine_attribute(self, i, support_threshold, confidence_threshold, original_transactions_info, tot_records_num,
+                       is_verbose=False, list_of_patterns=None):
+        """
+        Build the subtree of the attribute at position i in the inverse order of attributes,
+        append its patterns and the patterns of its own subtrees to list_of_patterns and return it.
+        """
+        if list_of_patterns is None:
+            list_of_patterns = []
+        list_of_patterns.extend(FPTree.gen_scheduled_patterns([(self, i)], support_threshold, confidence_threshold,
+                                                              original_transactions_info, tot_records_num, is_verbose))
         return list_of_patterns
 
+    @staticmethod
+    def gen_scheduled_patterns(jobs, support_threshold, confidence_threshold, original_transactions_info,
+                               tot_records_num, is_verbose=False):
+        """
+        Returns a generator of the patterns of the subtrees of jobs and of all their own subtrees,
+        mined from an explicit stack instead of recursion.
+        A job is a (tree, position) pair whose subtree is projected when the job is run.
+        Jobs are run depth first, so the patterns come in the order of the recursive mining
+        and a tree is released as soon as the subtree of its last position is projected.
+
+        Arguments:
+            jobs -- The jobs to run, in mining order.
+        """
+        stack = list(reversed(jobs))
+        del jobs
+        while stack:
+            tree, i = stack.pop()
+            subtree = tree.project_attribute(i, is_verbose)
+            # drop the reference of the job, the tree is released if this was its last position
+            tree = None
+
+            patterns, left_classes = subtree.mine_subtree(support_threshold, confidence_threshold,
+                                                          original_transactions_info, tot_records_num, is_verbose)
+            if len(patterns) > 0:
+                yield patterns
+            if left_classes > 0:
+                positions = subtree.get_mined_positions(True)
+                # the first position is on top of the stack
+                stack.extend((subtree, j) for j in reversed(positions))
+            subtree = None
+
+    def get_subtree_sizes(self, positions):
+        """
+        Returns the number of nodes of this tree that the subtree of every position is projected from:
+        the nodes of the attributes above the attribute of the position, counted along the header links.
+        """
+        attribute_nodes = {}
+        for att, header in self.headers.items():
+            num_nodes = 0
+            for node in header.values():
+                while node is not None:
+                    num_nodes += 1
+                    node = node.link
+            attribute_nodes[att] = num_nodes
+        inverse_order_of_attributes = list(reversed(self.sorting_order_per_attribute))
+        return [sum(attribute_nodes[att] for att in inverse_order_of_attributes[i + 1:]) for i in positions]
+
+    def project_attribute(self, i, is_verbose=False):
+        """
+        Returns the subtree of the attribute at position i in the inverse order of attributes.
+        """
+        inverse_order_of_attributes = list(reversed(self.sorting_order_per_attribute))
+        current_att = inverse_order_of_attributes[i]
+        # build new tree
+        if i == len(inverse_order_of_attributes) - 1:
+            next_att = None
+            rest_of_attributes = []
+        else:
+            next_att = inverse_order_of_attributes[i + 1]
+            rest_of_attributes = inverse_order_of_attributes[i+2:]
+        if i > 0:
+            previous_attributes = inverse_order_of_attributes[0:i]
+        else:
+            previous_attributes = []
+        if is_verbose:
+            print(str(i) + ": Subtree construction")
+
+        return self.get_subtree(previous_attributes, current_att, next_att, rest_of_attributes)
+                                   # ,self.transactions_info)
+
+    def mine_subtree(self, support_threshold, confidence_threshold, original_transactions_info, tot_records_num,
+                     is_verbose=False):
+        """
+        Returns the patterns of this subtree and the number of class labels left after pruning it.
+        """
+        self.init_scr_ruleitems(original_transactions_info)
+        self.init_scr_rules()
+        # subtree.get_scr_patterns(support_threshold, confidence_threshold)
+        if is_verbose:
+            print("done")
+            print("-------------------------------")
+            print(self.to_string(False, is_add_children=False))
+
+        patterns = self.get_scr_patterns_v2(support_threshold, confidence_threshold, tot_records_num)
+        #for pattern in patterns:
+        #    list_of_patterns.append(pattern)
+        if is_verbose:
+            print("SCR-patterns")
+            print(self.scr_patterns_to_string(patterns))
+
+        pruned_num, left_classes = self.prune_tree(support_threshold, original_transactions_info, is_verbose)
+        if is_verbose:
+            if pruned_num > 0:
+                print('--Pruned tree--')
+                print(self.to_string(False))
+        # now print the formed patterns
+        # patterns is an array of arrays, each sub-array consists of scr_ruleitems forming scr_pattern
+        return patterns, left_classes
+
     @staticmethod
     def check_frequency(scr_ruleitem, support_threshold):
         num_of_frequent = 0
@@ -296,41 +476,55 @@ class FPTree(object):
         return FREQUENT_ON_SOME_CLASSES
 
     @staticmethod
-    def get_frequent_contrast_pair(current_key, scr_ruleitem, scr_ruleitems_object, support_threshold):
-        # init the result variable
-        result = None
-
+    def has_frequent_contrast_pair(scr_ruleitem, group_frequencies, support_threshold):
+        """
+        Check if another scr_ruleitem of the group of scr_ruleitem is frequent on a class
+        other than the first frequent class of scr_ruleitem.
+        group_frequencies maps every class to the number of scr_ruleitems of the group frequent on it.
+        """
         # get the first frequent class for this scr_ruleitem
         frequent_class = None
         for key in scr_ruleitem.class_object:
             if scr_ruleitem.class_object[key] >= support_threshold:
                 frequent_class = key
                 break
-        # now do pairwise analysis:
-        # we need a scr_ruleitem with the same values of varying attributes and frequent on another class
-        for key in scr_ruleitems_object:
-            # don't compare with itself
-            if key == current_key:
+        for class_key in group_frequencies:
+            if class_key == frequent_class:
                 continue
-            scr_ruleitem_2 = scr_ruleitems_object[key]
-            # check if inv attributes have the same values
-            is_inv_same = FPTree.is_all_att_same(scr_ruleitem.inv_values, scr_ruleitem_2.inv_values)
-            # check if scr_ruleitem_2 is frequent on another class
-            is_frequent_2 = False
-            for class_key in scr_ruleitem_2.class_object:
-                if class_key == frequent_class:
-                    continue
-                if scr_ruleitem_2.class_object[class_key] >= support_threshold:
-                    is_frequent_2 = True
-                    break
-            if is_frequent_2 and is_inv_same:
-                result = key
-                break
-        return result
+            num_of_frequent = group_frequencies[class_key]
+            # don't count the scr_ruleitem itself
+            if scr_ruleitem.class_object.get(class_key, 0) >= support_threshold:
+                num_of_frequent -= 1
+            if num_of_frequent > 0:
+                return True
+        return False
+
+    def get_groups_frequencies(self, support_threshold):
+        """
+        Returns for every group of self.scr_groups the number of its scr_ruleitems frequent on every class.
+        """
+        groups_frequencies = {}
+        for inv_key in self.scr_groups:
+            group_frequencies = {}
+            for key in self.scr_groups[inv_key]:
+                class_object = self.scr_ruleitems[key].class_object
+                for class_key in class_object:
+                    if class_object[class_key] >= support_threshold:
+                        group_frequencies[class_key] = group_frequencies.get(class_key, 0) + 1
+            groups_frequencies[inv_key] = group_frequencies
+        return groups_frequencies
 
     def prune_tree(self, support_threshold, original_transactions_info, is_verbose=False):
+        """
+        Deactivate the class labels of the scr_ruleitems that can not form a pattern in a deeper subtree,
+        and return the numbers of deactivated and still active class labels.
+        The nodes are not visited: their counts on inactive labels are just never read again,
+        since the counts are only read on the labels of self.transactions_info['class'].
+        """
         to_delete_branches = []
         num_of_var = len(self.scr_ruleitems_info[VAR])
+        inv_atts = self.scr_ruleitems_info[INV]
+        groups_frequencies = None
         for key in self.scr_ruleitems:
             scr_ruleitem = self.scr_ruleitems[key]
             # check if it is frequent on all classes
@@ -351,44 +545,35 @@ class FPTree(object):
                     to_delete_branches.append(key)
                 else:
                     # try to search for a contast pair
-                    contrast_pair = self.get_frequent_contrast_pair(key, scr_ruleitem, self.scr_ruleitems, support_threshold)
-                    if contrast_pair is None:
+                    if groups_frequencies is None:
+                        groups_frequencies = self.get_groups_frequencies(support_threshold)
+                    inv_key = tuple(scr_ruleitem.inv_values[att] for att in inv_atts)
+                    if not self.has_frequent_contrast_pair(scr_ruleitem, groups_frequencies[inv_key],
+                                                           support_threshold):
                         # nothing was found ==> mark this key for deleting
                         to_delete_branches.append(key)
 
         # generate to_delete_class_values: combination of original classes with to_delete_branches
         to_delete_class_values = []
         for el in to_delete_branches:
-            for class_val in original_transactions_info[CLASS]:
-                to_delete_class_values.append('{},{}'.format(el, class_val))
+            branch_label = self.scr_ruleitem_labels[el]
+            for class_pos in range(0, self.label_radices[0]):
+                to_delete_class_values.append(branch_label + class_pos)
         if is_verbose:
             print('Prunning: marked for prunning: {}'.format(to_delete_branches))
             print('Prunning: classes for prunning: {}'.format(to_delete_class_values))
 
         if len(to_delete_branches) > 0:
             new_class_info_array = []
+            to_delete_labels = set(to_delete_class_values)
             # do the actual pruning
             # delete from self.transactions_info['class']
             for class_info_key in self.transactions_info[CLASS]:
-                if class_info_key not in to_delete_class_values:
+                if class_info_key not in to_delete_labels:
                     new_class_info_array.append(class_info_key)
             # update value of self.transactions_info['class']
             self.transactions_info['class'] = new_class_info_array
-            # now traverse the tree
-            FPTree.prune_node(self.root, to_delete_class_values)
-        return len(to_delete_class_values), len(self.root.count)
-
-    @staticmethod
-    def prune_node(node, to_delete_class_values):
-        # do the prunning
-        # delete from count
-        for el in to_delete_class_values:
-            if el in node.count:
-                del node.count[el]
-        # now process all children
-        for a_child in node.children:
-            FPTree.prune_node(a_child, to_delete_class_values)
-
+        return len(to_delete_class_values), len(self.transactions_info[CLASS])
 
     @staticmethod
     def scr_patterns_to_string(patterns):
@@ -453,7 +638,8 @@ class FPTree(object):
                 supp_1 = scr_ruleitem_1.class_object[chosen_class_1]
                 conf_1 = scr_ruleitem_1.rule_conf
                 pairs_arr = [{
-                    constants.LHS: key_1, constants.RHS: chosen_class_1,
+                    constants.LHS: self.item_dictionary.to_string(key_1),
+                    constants.RHS: self.item_dictionary.decode(chosen_class_1),
                     constants.LHS_SUPP_COUNT: scr_ruleitem_1.tot_supp,
                     constants.LHS_SUPP: (float(scr_ruleitem_1.tot_supp) / tot_records_num),
                     constants.RULE_SUPP_COUNT: supp_1,
@@ -485,7 +671,8 @@ class FPTree(object):
                             if is_inv_same and is_one_var_diff and ((num_inv > 0) or is_one_var_same):
                                 # ok, scr_ruleitem_1 and scr_ruleitem_2 form a pair
                                 pairs_arr.append({
-                                    constants.LHS: key_2, constants.RHS: chosen_class_2,
+                                    constants.LHS: self.item_dictionary.to_string(key_2),
+                                    constants.RHS: self.item_dictionary.decode(chosen_class_2),
                                     constants.LHS_SUPP_COUNT: scr_ruleitem_2.tot_supp,
                                     constants.LHS_SUPP: (float(scr_ruleitem_2.tot_supp) / tot_records_num),
                                     constants.RULE_SUPP_COUNT: supp_2,
@@ -498,7 +685,12 @@ class FPTree(object):
         return result
 
     def get_scr_patterns_v2(self, support_threshold, confidence_threshold, tot_records_num):
-
+        """
+        Returns the rules of the scr_ruleitems that form a contrasting pair with at least one other,
+        every rule has the positions (counted from 1) of its pairs as links.
+        Pairs are only searched between the ruleitems of a group with the same invariant values
+        and different chosen classes.
+        """
         result = []
         # num of varying attributes that form scr-ruleitems on this stage
         num_var = len(self.scr_ruleitems_info[VAR])
@@ -508,120 +700,75 @@ class FPTree(object):
         num_tot = num_var + num_inv
         if num_var == 0 or num_tot < 2:
             # no scr ruleitems can be generated on this step, return an empty array
-            pass
-        else:
-            # do processing to get the patterns
-            # gather all keys into an array to do pairwise comparison
-            keys_arr = []
-            ref_object = {}
-            rule_object = {}
-            for key in self.scr_ruleitems:
-                keys_arr.append(key)
-                ref_object[key] = []
-
-            # now do the pairwise comparison
-            for i in range(0, len(keys_arr)):
-                key_1 = keys_arr[i]
-                scr_ruleitem_1 = self.scr_ruleitems[key_1]
-                # check confidence and support
-                chosen_class_1 = scr_ruleitem_1.chosen_class
-                supp_1 = scr_ruleitem_1.class_object[chosen_class_1]
-                conf_1 = scr_ruleitem_1.rule_conf
-                # pairs_arr.append({key_1: scr_ruleitem_1})
-                if supp_1 >= support_threshold and conf_1 >= confidence_threshold:
-                    for j in range(i + 1, len(keys_arr)):
-                        key_2 = keys_arr[j]
-                        scr_ruleitem_2 = self.scr_ruleitems[key_2]
-                        # get chosen_class, supp and conf
-                        chosen_class_2 = scr_ruleitem_2.chosen_class
-                        supp_2 = scr_ruleitem_2.class_object[chosen_class_2]
-                        conf_2 = scr_ruleitem_2.rule_conf
-                        # check if classes are different and supp and conf are above thresholds
-                        if chosen_class_1 != chosen_class_2 and supp_2 >= support_threshold and conf_2 >= confidence_threshold:
-                            # perform different check
-                            # 1. invariant attributes have the same values
+            return result
+
+        var_atts = self.scr_ruleitems_info[VAR]
+        ref_object = {}
+        for inv_key in self.scr_groups:
+            # bucket the frequent and confident ruleitems of the group by chosen class,
+            # with the values of their varying attributes packed into a tuple
+            class_buckets = {}
+            for key in self.scr_groups[inv_key]:
+                scr_ruleitem = self.scr_ruleitems[key]
+                chosen_class = scr_ruleitem.chosen_class
+                if scr_ruleitem.class_object[chosen_class] >= support_threshold \
+                        and scr_ruleitem.rule_conf >= confidence_threshold:
+                    var_vals = tuple(scr_ruleitem.var_values[att] for att in var_atts)
+                    class_buckets.setdefault(chosen_class, []).append((key, var_vals))
+
+            # join the ruleitems across the class buckets
+            buckets = list(class_buckets.values())
+            for i in range(0, len(buckets)):
+                for j in range(i + 1, len(buckets)):
+                    for key_1, var_vals_1 in buckets[i]:
+                        for key_2, var_vals_2 in buckets[j]:
+                            # 1. invariant attributes have the same values (same group)
                             # 2. at least 1 of varying attributes has different values between 2 rules
                             # 3. if num_inv == 0 ==> at least 1 varying should have the same value
-                            is_inv_same = self.is_all_att_same(scr_ruleitem_1.inv_values, scr_ruleitem_2.inv_values)
-                            is_one_var_diff = self.is_at_least_one_att_diff(scr_ruleitem_1.var_values,
-                                                                            scr_ruleitem_2.var_values)
-                            is_one_var_same = self.is_at_least_one_att_same(scr_ruleitem_1.var_values,
-                                                                            scr_ruleitem_2.var_values)
-                            if is_inv_same and is_one_var_diff and ((num_inv > 0) or is_one_var_same):
-                                # ok, scr_ruleitem_1 and scr_ruleitem_2 form a pair
-                                if key_1 not in rule_object:
-                                    # form rule and put it into rule_object
-                                    # sort key_1 according to value; class has only one value, no need to sort
-                                    temp = key_1.split(',')
-                                    temp.sort()
-                                    key_1_sorted = ''
-                                    for el in temp:
-                                        key_1_sorted += el + ','
-                                    key_1_sorted = key_1_sorted[:-1]
-                                    # and also create set representations
-                                    LHS_set = set(temp)
-                                    RHS_set = set([chosen_class_1])
-                                    rule_1 = {
-                                        constants.LHS: key_1_sorted, constants.RHS: chosen_class_1,
-                                        constants.LHS_SET: LHS_set, constants.RHS_SET: RHS_set,
-                                        constants.LHS_SUPP_COUNT: scr_ruleitem_1.tot_supp,
-                                        constants.LHS_SUPP: (float(scr_ruleitem_1.tot_supp) / tot_records_num),
-                                        constants.RULE_SUPP_COUNT: supp_1,
-                                        constants.RULE_SUPP: (float(supp_1) / tot_records_num),
-                                        constants.RULE_CONF: conf_1
-                                    }
-                                    rule_object[key_1] = rule_1
-                                if key_2 not in rule_object:
-                                    # sort key_2 according to value; class has only one value, no need to sort
-                                    temp = key_2.split(',')
-                                    temp.sort()
-                                    key_2_sorted = ''
-                                    for el in temp:
-                                        key_2_sorted += el + ','
-                                    key_2_sorted = key_2_sorted[:-1]
-                                    # and also create set representations
-                                    LHS_set = set(temp)
-                                    RHS_set = set([chosen_class_2])
-                                    rule_2 = {
-                                        constants.LHS: key_2_sorted, constants.RHS: chosen_class_2,
-                                        constants.LHS_SET: LHS_set, constants.RHS_SET: RHS_set,
-                                        constants.LHS_SUPP_COUNT: scr_ruleitem_2.tot_supp,
-                                        constants.LHS_SUPP: (float(scr_ruleitem_2.tot_supp) / tot_records_num),
-                                        constants.RULE_SUPP_COUNT: supp_2,
-                                        constants.RULE_SUPP: (float(supp_2) / tot_records_num),
-                                        constants.RULE_CONF: conf_2
-                                    }
-                                    rule_object[key_2] = rule_2
-                                # this is a good pair, update references object
-                                ref_object[key_1].append(key_2)
-                                ref_object[key_2].append(key_1)
-            # now form array of rules who have pairs
-            # this variable will contain a position of rule in final array
-            key_to_pos_object = {}
-            pos_to_key_object = {}
-            for key in ref_object:
-                if len(ref_object[key]) > 0:
-                    # there are some links, add it to the final list
-                    pos = len(result)
-                    result.append(rule_object[key])
-                    # save the position
-                    key_to_pos_object[key] = pos
-                    pos_to_key_object[pos] = key
-
-            # now update references
-            for pos in range(0, len(result)):
-                key = pos_to_key_object[pos]
-                link_keys = ref_object[key]
-                ref_str = ''
-                for link_key in link_keys:
-                    link_pos = key_to_pos_object[link_key]
-                    # do the correction to count from 1
-                    ref_str += str(link_pos+1) + ','
-                # add new field to the rule
-                result[pos][constants.LINKS] = ref_str[:-1]
+                            if var_vals_1 == var_vals_2:
+                                continue
+                            if num_inv == 0 and not any(val_1 == val_2 for val_1, val_2
+                                                        in zip(var_vals_1, var_vals_2)):
+                                continue
+                            # ok, scr_ruleitem_1 and scr_ruleitem_2 form a pair
+                            ref_object.setdefault(key_1, []).append(key_2)
+                            ref_object.setdefault(key_2, []).append(key_1)
+
+        # now form array of rules who have pairs, in the order of the scr_ruleitems
+        # this variable will contain a position of rule in final array
+        key_to_pos_object = {}
+        for key in self.scr_ruleitems:
+            if key in ref_object:
+                key_to_pos_object[key] = len(result)
+                result.append(self.form_scr_rule(key, self.scr_ruleitems[key], tot_records_num))
+
+        # now update references
+        for rule, key in zip(result, key_to_pos_object):
+            link_positions = sorted(key_to_pos_object[link_key] for link_key in ref_object[key])
+            # do the correction to count from 1
+            rule[constants.LINKS] = ','.join(str(link_pos + 1) for link_pos in link_positions)
 
         return result
 
+    def form_scr_rule(self, key, scr_ruleitem, tot_records_num):
+        """
+        Returns the rule of the scr_ruleitem with key, with decoded antecedent and consequent.
+        """
+        chosen_class = scr_ruleitem.chosen_class
+        supp = scr_ruleitem.class_object[chosen_class]
+        # decode key and sort it according to value
+        temp = self.item_dictionary.decode_items(key)
+        RHS_str = self.item_dictionary.decode(chosen_class)
+        return {
+            constants.LHS: ','.join(temp), constants.RHS: RHS_str,
+            constants.LHS_SET: set(temp), constants.RHS_SET: set([RHS_str]),
+            constants.LHS_SUPP_COUNT: scr_ruleitem.tot_supp,
+            constants.LHS_SUPP: (float(scr_ruleitem.tot_supp) / tot_records_num),
+            constants.RULE_SUPP_COUNT: supp,
+            constants.RULE_SUPP: (float(supp) / tot_records_num),
+            constants.RULE_CONF: scr_ruleitem.rule_conf
+        }
+
     @staticmethod
     def is_all_att_same(dic_1, dic_2):
         # dic_1 and dic_2 are 2 dictionaries of the form
@@ -661,58 +808,51 @@ class FPTree(object):
     def init_scr_ruleitems(self, original_transactions_info):
         scr_ruleitems = {}
         scr_ruleitems_info = {}
+        scr_ruleitem_labels = {}
         init_meta_info = True
-        for el in self.root.count:
-            pos = el.rfind(',')
-            hash_val = el[0:pos]
-            class_val = el[pos+1:]
+        for el in self.transactions_info[CLASS]:
+            # the class is the least significant digit of the label
+            hash_val, class_val = self.decode_label(el)
             if hash_val in scr_ruleitems:
                 # ruleitem is already there, just update class info
                 scr_ruleitems[hash_val].class_object[class_val] = self.root.count[el]
             else:
                 # add this scr_rileitem
                 scr_ruleitem, list_of_inv, list_of_var = FPTree.decompose_element(hash_val, class_val, self.root.count[el],
-                                                        original_transactions_info, init_meta_info)
+                                                                                  self.schema, init_meta_info)
                 if init_meta_info:
                     init_meta_info = False
                     scr_ruleitems_info['inv'] = list_of_inv
                     scr_ruleitems_info['var'] = list_of_var
 
                 scr_ruleitems[hash_val] = scr_ruleitem
+                scr_ruleitem_labels[hash_val] = el - el % self.label_radices[0]
         self.scr_ruleitems = scr_ruleitems
         self.scr_ruleitems_info = scr_ruleitems_info
+        self.scr_ruleitem_labels = scr_ruleitem_labels
         self.form_scr_ruleitmes_groups()
 
     def form_scr_ruleitmes_groups(self):
-        analyzed_scr_ruleitems = []
-        scr_groups = []
-
-        # essentially devide on groups depending on the value of invariant attribute
-        # thereby, if there are no invariant attribute, there is only one group
-
-        if len(self.scr_ruleitems_info['inv']) == 0:
-            new_group = []
-            for hash_val in self.scr_ruleitems_info:
-                new_group.append(hash_val)
-            scr_groups.append(new_group)
-        else:
-            for hash_val in self.scr_ruleitems:
-                if hash_val not in analyzed_scr_ruleitems:
-                    # add it to analyzed_scr_ruleitems and try to search for pairs
-                    analyzed_scr_ruleitems.append(hash_val)
-                    a_group = []
-
-                    for hash_val_2 in self.scr_ruleitems:
-                        if hash_val_2 not in analyzed_scr_ruleitems:
-                            # check if has_val and hash_val_2 can be a pair
-                            # they should have the same values of invariant attiributes
-                            # the varying attributes are already the same and at least some of them will
-                            # have different values
-                            pass
-            pass
+        """
+        Divide the scr_ruleitems on groups with the same values of the invariant attributes,
+        if there are no invariant attributes, there is only one group.
+        self.scr_groups maps the tuple of the invariant values to the keys of the group.
+        """
+        inv_atts = self.scr_ruleitems_info.get(INV, [])
+        scr_groups = {}
+        for hash_val in self.scr_ruleitems:
+            inv_values = self.scr_ruleitems[hash_val].inv_values
+            inv_key = tuple(inv_values[att] for att in inv_atts)
+            scr_groups.setdefault(inv_key, []).append(hash_val)
+        self.scr_groups = scr_groups
 
     @staticmethod
-    def decompose_element(scr_element, class_val, element_frequency, original_transactions_info, meta_info=False):
+    def decompose_element(scr_element, class_val, element_frequency, schema, meta_info=False):
+        """
+        Returns the SCRRuleitem of the attribute values of scr_element,
+        and the lists of its invariant and varying attributes if meta_info.
+        schema is the AttributeSchema of the original transactions_info.
+        """
         var_values = {}
         list_of_var =[]
         inv_values = {}
@@ -721,206 +861,125 @@ class FPTree(object):
         #hash_val=''
         # class is the las element
         class_obj[class_val] = element_frequency
-        for el in scr_element.split(","):
+        for el in scr_element:
             # check if the value of el is in invariant, varying
-            found = False
-            # search in var
-            for att in original_transactions_info['var']['order']:
-                for att_val in original_transactions_info['var'][att]:
-                    if el == att_val:
-                        #hash_val+=att
-                        if meta_info:
-                            list_of_var.append(att)
-                        var_values[att] = att_val
-                        found = True
-                        break
-            if not found:
-                # continue to search in inv
-                for att in original_transactions_info['inv']['order']:
-                    for att_val in original_transactions_info['inv'][att]:
-                        if el == att_val:
-                            #hash_val += att
-                            if meta_info:
-                                list_of_inv.append(att)
-                            inv_values[att] = att_val
-                            found = True
-                            break
+            att = schema.attribute_of(el)
+            att_type = schema.type_of(el)
+            if att_type == VAR:
+                if meta_info:
+                    list_of_var.append(att)
+                var_values[att] = el
+            elif att_type == INV:
+                if meta_info:
+                    list_of_inv.append(att)
+                inv_values[att] = el
         # return (hash_val, SCRRuleitem(list_of_inv, inv_values, list_of_var, var_values, class_obj))
         return SCRRuleitem(inv_values, var_values, class_obj), list_of_inv, list_of_var
 
-    def revert_tree_to_transactions(self):
-        all_transactions = []
-        # idea: revert from the leaves of the tree
-        # identify the attribute that corresponds to the leafs of this tree
-        last_att_key = self.sorting_order_per_attribute[-1]
-        # get the headers for this attribute
-        header_dic = self.headers[last_att_key]
-        # now process every possible value of this attribute
-        for val_key in header_dic:
-            # get the leaf and reconstruct transactions from this leaf
-            node = header_dic[val_key]
-            while node is not None:
-                node_transactions = FPTree.reconstruct_node_transactions(node)
-                all_transactions.extend(node_transactions)
-                node = node.link
-        return all_transactions
-
-    @staticmethod
-    def reconstruct_node_transactions(node):
-        result_list_of_transactions = []
-
-        # reconstruct the path to the root and gather all items on the way
-        # get the value of the current node
-        transaction = []
-        next_node = node
-        # value == None means we have reached the root
-        while next_node.value is not None:
-            transaction.append(next_node.value)
-            next_node = next_node.parent
-        # initialize the class value in transactions
-        transaction.append('')
-        # no add required number of transactions for all classes
-        for class_val in node.count:
-            num = node.count[class_val]
-            transaction[-1] = class_val
-            for i in range(0, num):
-                to_add = transaction[:]
-                result_list_of_transactions.append(to_add)
-
-        return result_list_of_transactions
-
-    def make_copy_of_tree(self, transactions_info):
-        transactions = self.revert_tree_to_transactions()
-        new_tree = FPTree(transactions, transactions_info)
-        return new_tree
-
     def get_subtree(self, previous_attributes, current_att, next_att, rest_of_attributes):
-        # this should be replaces with converting self into a list of transactions and making new tree of it
-        #subtree = copy.deepcopy(self)
-        subtree = FPTree.make_copy_of_tree(self, self.transactions_info)
-
+        """
+        Returns the tree without current_att and previous_attributes, where the values of current_att
+        are merged into the class labels.
+        The subtree is projected from the nodes of this tree down to the level of current_att
+        in one post-order pass, so the deeper levels are never visited and no transactions are reconstructed.
+        """
         # define new class values
         # get the values of the current attribute that will be added to class label
-        current_class_values = self.transactions_info["class"]
-
-        att_type_key = subtree.get_attribute_type(current_att)
-        current_attribute_values = self.transactions_info[att_type_key][current_att]
-        # combine them with the class values
+        current_class_values = self.transactions_info[CLASS]
+        current_attribute_values = self.schema.attribute_values[current_att]
+        # combine them with the class values: the value becomes the most significant digit of the label
+        num_classes = len(current_class_values)
+        value_slices = {}
         new_class_values = []
-        for curr_att_val in current_attribute_values:
+        for value_pos, curr_att_val in enumerate(current_attribute_values):
+            value_offset = value_pos * self.label_space
+            value_slices[curr_att_val] = slice(value_pos * num_classes, (value_pos + 1) * num_classes)
             for curr_class in current_class_values:
-                new_class_values.append(curr_att_val + ',' + curr_class)
-
-        # update tree structure
-
-        # update class values in the leafs of the tree (if it is not root)
-        if next_att is not None:
-            for next_att_val in subtree.headers[next_att]:
-                # next_att_val is a node for which the values should be updated
-                next_att_node = subtree.headers[next_att][next_att_val]
-                while next_att_node is not None:
-                    next_att_node.count = {}
-                    for new_class_val in new_class_values:
-                        next_att_node.count[new_class_val] = 0
-
-                    for a_child in next_att_node.children:
-                        for class_val in current_class_values:
-                            next_att_node.count[a_child.value + "," + class_val] = a_child.count[class_val]
-                    # delete children
-                    next_att_node.children = []
-                    next_att_node = next_att_node.link
-
-        # now propagate changes to the root
-        # change the class labels and values for the rest of the nodes
-        for next_level_att in rest_of_attributes:
-            for next_att_val in subtree.headers[next_level_att]:
-                next_att_node = subtree.headers[next_level_att][next_att_val]
-                while next_att_node is not None:
-                    FPTree.update_node_counts_according_to_children(next_att_node, new_class_values)
-                    next_att_node = next_att_node.link
-
-        # update values for root node
-        if next_att is not None:
-            FPTree.update_node_counts_according_to_children(subtree.root, new_class_values)
+                new_class_values.append(value_offset + curr_class)
+        # reads the counts of a node on the current class values as a tuple
+        if num_classes == 1:
+            read_counts = lambda count, class_val=current_class_values[0]: (count[class_val],)
         else:
+            read_counts = operator.itemgetter(*current_class_values)
+
+        # transactions_info ==> set the new class values and delete the current and previous attributes
+        removed_attributes = set(previous_attributes)
+        removed_attributes.add(current_att)
+        subtree_info = {}
+        for att_type in (INV, VAR):
+            subtree_info[att_type] = dict((key, value) for key, value in self.transactions_info[att_type].items()
+                                          if key not in removed_attributes)
+            subtree_info[att_type]['order'] = [att for att in self.transactions_info[att_type]['order']
+                                               if att not in removed_attributes]
+        subtree_info[CLASS] = new_class_values
+        # an empty tree with the headers and sorting orders of the remaining attributes
+        subtree = FPTree([], subtree_info, self.item_dictionary, weighted=True, schema=self.schema,
+                         label_attributes=self.label_attributes + [current_att])
+
+        if next_att is None:
             # this is the last root level
-            subtree.root.count = {}
-            # initialize root.count with 0 for all new class_values
-            for new_class_val in new_class_values:
-                subtree.root.count[new_class_val] = 0
-            for a_child in subtree.root.children:
-                for class_val in current_class_values:
-                    subtree.root.count[a_child.value + "," + class_val] = a_child.count[class_val]
-            # delete children
-            subtree.root.children = []
-
-        # now update the rest of the attributes of the tree
-        # headers, sorting_order_per_attribute, sorting_order_per_value, transactions_info
-
-        # headers ==> just delete everything that is not in next_att or in rest_of_attributes
-        new_headers = {}
-        # keys should be the same for headers and sorting_order_per_attribute
-        for key in subtree.headers:
-            if (key == next_att) or (key in rest_of_attributes):
-                new_headers[key] = subtree.headers[key]
-        subtree.headers = new_headers
-        # del subtree.headers[current_att]
-
-        # sorting_order_per_attribute ==> just delete current and previous attributes
-        subtree.sorting_order_per_attribute.remove(current_att)
-        for val in previous_attributes:
-            subtree.sorting_order_per_attribute.remove(val)
-
-        # sorting_order_per_value ==> delete value of current attribute and previous attributes
-        values_of_current_att = subtree.transactions_info[att_type_key][current_att][:]
-        for val in values_of_current_att:
-            subtree.sorting_order_per_value.remove(val)
-        # for previous attributes
-        for att in previous_attributes:
-            temp_key = subtree.get_attribute_type(att)
-            values_of_current_att = subtree.transactions_info[temp_key][att][:]
-            for val in values_of_current_att:
-                subtree.sorting_order_per_value.remove(val)
-        # delete values of class attribute
-        for val in current_class_values:
-            subtree.sorting_order_per_value.remove(val)
-        # now add new class values
-        for val in new_class_values:
-            subtree.sorting_order_per_value.append(val)
-
-        # transactions_info ==> update 'class' and 'var/inv'
-        # class - set new class values
-        subtree.transactions_info['class'] = new_class_values[:]
-        # var/inv - delete the values of current attribute
-        del subtree.transactions_info[att_type_key][current_att]
-        # and delete from ordering info
-        subtree.transactions_info[att_type_key]['order'].remove(current_att)
-        # delete previous attributes
-        for att in previous_attributes:
-            temp_key = self.get_attribute_type(att)
-            # delete the values
-            del subtree.transactions_info[temp_key][att]
-            # delete from ordering info
-            subtree.transactions_info[temp_key]['order'].remove(att)
-
+            counts = FPTree.merge_children_counts(self.root, read_counts, value_slices, len(new_class_values))
+        else:
+            counts = subtree.project_node(self.root, subtree.root, self.headers[next_att], read_counts,
+                                          value_slices, new_class_values)
+        if counts is not None:
+            subtree.root.count = dict(zip(new_class_values, counts))
         return subtree
 
-    def get_attribute_type(self, attribute):
-        if attribute in self.transactions_info['var']:
-            return 'var'
-        else:
-            return 'inv'
+    def project_node(self, node, projected_node, next_att_values, read_counts, value_slices, new_class_values):
+        """
+        Copy the children of node under projected_node down to the level of next_att,
+        whose nodes take the merged counts of their children.
+        Branches with no count on any class are left out.
+        Returns the counts of projected_node as a list aligned with new_class_values,
+        summed from the counts of its children, or None if it has no children.
+        """
+        node_counts = None
+        for a_child in node.children.values():
+            projected_child = FPNode(a_child.value, (), None, projected_node)
+            if a_child.value in next_att_values:
+                counts = FPTree.merge_children_counts(a_child, read_counts, value_slices, len(new_class_values))
+                if not any(counts):
+                    continue
+            else:
+                counts = self.project_node(a_child, projected_child, next_att_values, read_counts, value_slices,
+                                           new_class_values)
+                if counts is None:
+                    continue
+            projected_child.count = dict(zip(new_class_values, counts))
+            projected_node.children[a_child.value] = projected_child
+            self.link_node(projected_child)
+            if node_counts is None:
+                node_counts = counts
+            else:
+                node_counts = list(map(operator.add, node_counts, counts))
+        return node_counts
 
     @staticmethod
-    def update_node_counts_according_to_children(node, class_values):
-        if len(node.children) > 0:
-            node.count = {}
-            # set all values here to 0
-            for class_val in class_values:
-                node.count[class_val] = 0
-            for a_child in node.children:
-                for class_val in class_values:
-                    node.count[class_val] += a_child.count[class_val]
+    def merge_children_counts(node, read_counts, value_slices, num_labels):
+        """
+        Returns the counts of node on the new class labels as a list of num_labels counts,
+        where the slice of the value of a child holds the counts read from that child.
+        """
+        counts = [0] * num_labels
+        for a_child in node.children.values():
+            counts[value_slices[a_child.value]] = read_counts(a_child.count)
+        return counts
+
+    def link_node(self, node):
+        """
+        Append node to the header of its value.
+        """
+        header = self.headers.get(self.schema.attribute_of(node.value))
+        if header is not None and node.value in header:
+            if header[node.value] is None:
+                header[node.value] = node
+            else:
+                self.tails[node.value].link = node
+            self.tails[node.value] = node
+
+    def get_attribute_type(self, attribute):
+        return self.schema.attribute_type_of(attribute)
 
     def node_to_string(self, node, tab_count=0, is_add_children=False):
         tabs_str = ''
@@ -930,12 +989,12 @@ class FPTree(object):
         node_str = tabs_str + str(node.value) + ': '  # + str(node.count)
         class_str = ''
         for key in self.transactions_info['class']:
-            class_str += key + ': ' + str(node.count[key]) + ', '
+            class_str += str(key) + ': ' + str(node.count[key]) + ', '
         node_str += '{' + class_str + '}'
 
         children_str = ''
         if is_add_children:
-            for child_node in node.children:
+            for child_node in node.children.values():
                 children_str += '\n\t' + tabs_str + self.node_to_string(child_node, tab_count+1, True)
 
         return node_str + children_str
@@ -963,21 +1022,99 @@ class FPTree(object):
                     #temp = self.scr_ruleitems_info[key]
                     temp += '\n\t' + key + '\t' + str(self.scr_ruleitems_info[key])
                 for key in self.scr_ruleitems:
-                    temp += '\n\t' + key + '\t' + self.scr_ruleitems[key].to_string()
+                    temp += '\n\t' + str(key) + '\t' + self.scr_ruleitems[key].to_string()
                 #temp += '\n\tchosen_class\t' + self.scr_ruleitems.chosen_class
                 #temp += '\n\trule_conf\t' + self.scr_ruleitems.rule_conf
             tree_structure_str += temp
         return tree_structure_str
 
 
-def find_frequent_patterns(transactions, transactions_info, support_threshold, confidence_threshold, is_verbose=False):
+def encode_transactions_info(transactions_info, item_dictionary):
+    """
+    Replace the attribute and class values of transactions_info by their item ids
+    """
+    encoded_info = {}
+    for att_type in (INV, VAR):
+        att_type_info = {'order': transactions_info[att_type]['order'][:]}
+        for att in att_type_info['order']:
+            att_type_info[att] = [item_dictionary.add(att_val) for att_val in transactions_info[att_type][att]]
+        encoded_info[att_type] = att_type_info
+    encoded_info[CLASS] = [item_dictionary.encode(class_val) for class_val in transactions_info[CLASS]]
+    return encoded_info
+
+
+# the main tree of a worker process, built once by init_worker
+_worker_tree = None
+
+
+def init_worker(weighted_transactions, encoded_info, item_dictionary):
+    """
+    Build the main tree in a worker process.
+    """
+    global _worker_tree
+    _worker_tree = FPTree(weighted_transactions, encoded_info, item_dictionary, weighted=True)
+
+
+def mine_worker_attribute(args):
+    """
+    Returns the patterns of the attribute at a position of the main tree of the worker process.
+    args are the arguments of FPTree.mine_attribute.
+    """
+    return _worker_tree.mine_attribute(*args)
+
+
+def find_frequent_patterns(transactions, transactions_info, support_threshold, confidence_threshold, is_verbose=False,
+                           workers=None, largest_first=True):
     """
     Given a set of transactions, find the patterns in it
     over the specified support threshold.
+    If workers > 1, the top-level attributes are mined in that many processes,
+    the patterns are the same and in the same order as the ones mined in a single process.
+    If largest_first, the top-level attributes are handed to the processes from the largest subtree
+    to the smallest, so the largest ones do not start last; otherwise in mining order.
     """
-    tree = FPTree(transactions, transactions_info)
+    return list(gen_frequent_patterns(transactions, transactions_info, support_threshold, confidence_threshold,
+                                      is_verbose, workers, largest_first))
+
+
+def gen_frequent_patterns(transactions, transactions_info, support_threshold, confidence_threshold, is_verbose=False,
+                          workers=None, largest_first=True):
+    """
+    Returns a generator of the patterns of find_frequent_patterns, in the same order.
+    Patterns are yielded as soon as their subtree is mined,
+    or with workers > 1, as soon as their top-level attribute is mined.
+    """
+    # mine item ids; the tree replaces the class value of every transaction by its class label
+    transactions = EncodedTransactions.create(transactions, transactions_info[CLASS])
+    item_dictionary = transactions.item_dictionary
+    encoded_info = encode_transactions_info(transactions_info, item_dictionary)
+    weighted_transactions = list(transactions.weighted())
+
+    tree = FPTree(weighted_transactions, encoded_info, item_dictionary, weighted=True)
     if is_verbose:
         print('Original FP_tree\n' + tree.to_string(False))
     #print tree.to_string()
-    return tree.mine_patterns(support_threshold, confidence_threshold, transactions_info, len(transactions), is_verbose)
+    if workers is None or workers <= 1:
+        for patterns in tree.gen_patterns(support_threshold, confidence_threshold, encoded_info,
+                                          transactions.num_transaction, is_verbose):
+            yield patterns
+        return
+
+    # every worker builds its own main tree, the subtrees of the attributes are independent.
+    positions = tree.get_mined_positions()
+    submit_order = positions
+    if largest_first:
+        sizes = dict(zip(positions, tree.get_subtree_sizes(positions)))
+        submit_order = sorted(positions, key=lambda i: -sizes[i])
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(weighted_transactions, encoded_info, item_dictionary)) as executor:
+        futures = {}
+        for i in submit_order:
+            futures[i] = executor.submit(mine_worker_attribute, (i, support_threshold, confidence_threshold,
+                                                                 encoded_info, transactions.num_transaction,
+                                                                 is_verbose))
+        # the results are yielded in mining order
+        for i in positions:
+            for patterns in futures[i].result():
+                yield patterns
 
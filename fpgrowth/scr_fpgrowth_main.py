@@ -6,7 +6,7 @@ sys.path.insert(0, '../util')
 import util_functions
 
 
-def run_census(file_name, support_number_threshold, confidence_threshold, output_file_name=None):
+def run_census(file_name, support_number_threshold, confidence_threshold, output_file_name=None, workers=None):
     """
     Generate SCR-patterns for census data files.
 
@@ -14,6 +14,7 @@ def run_census(file_name, support_number_threshold, confidence_threshold, output
     :param support_number_threshold: minimum support number
     :param confidence_threshold: minimum confidence
     :param output_file - a file to save resulting patterns, if none, the results are printed
+    :param workers - the number of processes mining the top-level attributes, if none, a single process
     :return:
     """
     trans_info = {"inv": {"order": ["06", "07", "08", "09", "10", "11"],
@@ -76,23 +77,23 @@ def run_census(file_name, support_number_threshold, confidence_threshold, output
                           },
                   "class": ['YES', 'NO']}
 
-    transactions = util_functions.unzip_transactions_2(file_name)
+    transactions = util_functions.unzip_encoded_transactions(file_name, trans_info['class'], deduplicate=True)
 
     start = time.time()
-    patterns = scr_fpgrowth.find_frequent_patterns(transactions, trans_info, support_number_threshold,
-                                                     confidence_threshold, is_verbose=False)
-    end = time.time()
-    print('Total elapsed for patterns construction {}'.format(end - start))
-    str_res = util_functions.patterns_to_string(patterns)
+    # the patterns are written while they are mined
+    patterns = scr_fpgrowth.gen_frequent_patterns(transactions, trans_info, support_number_threshold,
+                                                  confidence_threshold, is_verbose=False, workers=workers)
     if output_file_name is None:
         # print the results
         print('\nPatterns')
-        print(str_res)
+        util_functions.write_patterns(patterns, sys.stdout)
     else:
         # print results into a file
         print('Saving results to {}   ...'.format(output_file_name))
         with open(output_file_name, 'w') as output_file:
-            output_file.write(str_res)
+            util_functions.write_patterns(patterns, output_file)
+    end = time.time()
+    print('Total elapsed for patterns construction {}'.format(end - start))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,50 @@
+"""
+Candidate generation shared by the apriori family.
+"""
+
+
+def prefix_join(prev_candidates, length, attribute_of=None):
+    """
+    Returns the apriori candidates of the given length as a list of frozensets,
+    in the lexicographic order of their sorted items.
+
+    Two sorted (length - 1)-itemsets sharing their first length - 2 items are joined
+    (the F(k-1) x F(k-1) method), and a candidate is kept only if all of its
+    (length - 1)-subsets are in prev_candidates.
+
+    Arguments:
+        prev_candidates -- Previous candidates as a set of frozensets.
+        length -- The lengths of the next candidates.
+        attribute_of -- A function returning the attribute of an item or None.
+                        If given, two values of the same attribute are never joined.
+    """
+    if not isinstance(prev_candidates, (set, frozenset)):
+        prev_candidates = set(prev_candidates)
+    sorted_candidates = sorted(tuple(sorted(candidate)) for candidate in prev_candidates)
+
+    next_candidates = []
+    num_candidates = len(sorted_candidates)
+    start = 0
+    while start < num_candidates:
+        # find the block of itemsets sharing the same prefix
+        prefix = sorted_candidates[start][:-1]
+        end = start + 1
+        while end < num_candidates and sorted_candidates[end][:-1] == prefix:
+            end += 1
+
+        for i in range(start, end - 1):
+            first = sorted_candidates[i]
+            if attribute_of is not None:
+                first_attribute = attribute_of(first[-1])
+            for j in range(i + 1, end):
+                # the prefix already holds distinct attributes, only the joined items may clash
+                if attribute_of is not None and attribute_of(sorted_candidates[j][-1]) == first_attribute:
+                    continue
+                candidate = first + sorted_candidates[j][-1:]
+                # the two subsets without one of the last items are first and sorted_candidates[j],
+                # check the subsets without one of the prefix items
+                if all(frozenset(candidate[:pos] + candidate[pos + 1:]) in prev_candidates
+                       for pos in range(length - 2)):
+                    next_candidates.append(frozenset(candidate))
+        start = end
+    return next_candidates
@@ -0,0 +1,294 @@
+"""
+Integer encoding of transaction items shared by all the miners.
+"""
+
+CLASS_ATTRIBUTE = 'class'
+
+
+def census_attribute_of(item):
+    """
+    Returns the attribute code of a census item (eg. '01' for '01-H. owned').
+    """
+    return item[:2]
+
+
+class ItemDictionary(object):
+    """
+    Maps every distinct item to a dense integer id.
+
+    Ids are assigned in the sorted order of the items, so sorting ids gives
+    the same order as sorting the original strings. Every id also knows its
+    attribute id and, for class values, its class id.
+    """
+
+    def __init__(self, items, class_values=None, attribute_of=None):
+        """
+        Initialize.
+
+        Arguments:
+            items -- An iterable object of items (eg. ['A', 'B']).
+            class_values -- An iterable object of class values (eg. ['YES', 'NO']).
+                            They share the CLASS_ATTRIBUTE attribute.
+            attribute_of -- A function returning the attribute code of an item
+                            (eg. census_attribute_of) or None if every item is an attribute of its own.
+        """
+        self.__attribute_of = attribute_of
+        self.__class_values = list(class_values) if class_values is not None else []
+        self.__class_index = {}
+        for class_id, class_val in enumerate(self.__class_values):
+            self.__class_index[class_val] = class_id
+
+        self.__items = []
+        self.__ids = {}
+        self.__attribute_ids = []
+        self.__class_ids = []
+        self.__attribute_codes = []
+        self.__attribute_index = {}
+
+        for item in sorted(set(items).union(self.__class_values)):
+            self.add(item)
+
+    def add(self, item):
+        """
+        Returns the id of item, registering it if it is not known yet.
+        """
+        item_id = self.__ids.get(item)
+        if item_id is not None:
+            return item_id
+
+        item_id = len(self.__items)
+        self.__items.append(item)
+        self.__ids[item] = item_id
+
+        class_id = self.__class_index.get(item)
+        if class_id is None:
+            attribute_code = item if self.__attribute_of is None else self.__attribute_of(item)
+        else:
+            attribute_code = CLASS_ATTRIBUTE
+        attribute_id = self.__attribute_index.get(attribute_code)
+        if attribute_id is None:
+            attribute_id = len(self.__attribute_codes)
+            self.__attribute_codes.append(attribute_code)
+            self.__attribute_index[attribute_code] = attribute_id
+        self.__attribute_ids.append(attribute_id)
+        self.__class_ids.append(class_id)
+        return item_id
+
+    def encode(self, item):
+        """
+        Returns the id of a known item.
+        """
+        return self.__ids[item]
+
+    def __contains__(self, item):
+        return item in self.__ids
+
+    def encode_items(self, items):
+        """
+        Returns the ids of items as a list, keeping their order.
+        """
+        ids = self.__ids
+        return [ids[item] for item in items]
+
+    def decode(self, item_id):
+        """
+        Returns the item of an id.
+        """
+        return self.__items[item_id]
+
+    def decode_items(self, item_ids):
+        """
+        Returns the items of ids as a sorted list.
+        """
+        items = self.__items
+        return sorted(items[item_id] for item_id in item_ids)
+
+    def to_string(self, item_ids):
+        """
+        Returns the items of ids in the output format of the rules (eg. 'A,B').
+        """
+        return ','.join(self.decode_items(item_ids))
+
+    def attribute_id(self, item_id):
+        """
+        Returns the attribute id of an item id.
+        """
+        return self.__attribute_ids[item_id]
+
+    def attribute_code(self, item_id):
+        """
+        Returns the attribute code of an item id (eg. '01').
+        """
+        return self.__attribute_codes[self.__attribute_ids[item_id]]
+
+    def class_id(self, item_id):
+        """
+        Returns the index of an item id in the class values or None.
+        """
+        return self.__class_ids[item_id]
+
+    @property
+    def num_items(self):
+        """
+        Returns the number of known items.
+        """
+        return len(self.__items)
+
+    @property
+    def attribute_ids(self):
+        """
+        Returns the list of attribute ids indexed by item id.
+        """
+        return self.__attribute_ids
+
+    @property
+    def attribute_codes(self):
+        """
+        Returns the list of attribute codes indexed by attribute id.
+        """
+        return self.__attribute_codes
+
+    @property
+    def class_values(self):
+        """
+        Returns the class values in the order of their class ids.
+        """
+        return self.__class_values
+
+    @property
+    def class_item_ids(self):
+        """
+        Returns the item ids of the class values in the order of their class ids.
+        """
+        return self.encode_items(self.__class_values)
+
+
+class EncodedTransactions(object):
+    """
+    Transactions of item ids together with their ItemDictionary.
+
+    Every transaction may carry a weight, the number of identical rows it stands for.
+    Iterating yields each distinct transaction once; weighted() pairs them with their weights.
+
+    Once deduplicated, iterating and len() drop the weights: counting supports on the plain
+    transactions (eg. passing them to an FPTree without weighted=True or to find_itemsets_in_transactions)
+    undercounts without any error. Count on weighted() and use num_transaction for the number of rows.
+    """
+
+    def __init__(self, transactions, item_dictionary, weights=None):
+        """
+        Initialize.
+
+        Arguments:
+            transactions -- A list of transactions of item ids (eg. [[0, 1], [1, 2]]).
+            item_dictionary -- The ItemDictionary used to encode them.
+            weights -- The weight of every transaction as a list or None for weights of 1.
+        """
+        self.__transactions = transactions
+        self.__item_dictionary = item_dictionary
+        self.__weights = weights
+
+    def __iter__(self):
+        return iter(self.__transactions)
+
+    def __len__(self):
+        return len(self.__transactions)
+
+    def __getitem__(self, index):
+        return self.__transactions[index]
+
+    def weighted(self):
+        """
+        Returns an iterator of (transaction, weight) pairs.
+        """
+        if self.__weights is None:
+            return ((transaction, 1) for transaction in self.__transactions)
+        return zip(self.__transactions, self.__weights)
+
+    def deduplicate(self):
+        """
+        Returns EncodedTransactions where identical transactions are collapsed
+        into the first of them, weighted by the sum of their weights.
+        """
+        positions = {}
+        transactions = []
+        weights = []
+        for transaction, weight in self.weighted():
+            key = frozenset(transaction)
+            pos = positions.get(key)
+            if pos is None:
+                positions[key] = len(transactions)
+                transactions.append(transaction)
+                weights.append(weight)
+            else:
+                weights[pos] += weight
+        return EncodedTransactions(transactions, self.__item_dictionary, weights)
+
+    @property
+    def weights(self):
+        """
+        Returns the list of the weights of the transactions or None if they are all 1.
+        """
+        return self.__weights
+
+    @property
+    def num_transaction(self):
+        """
+        Returns the number of rows the transactions stand for, the sum of their weights.
+        """
+        if self.__weights is None:
+            return len(self.__transactions)
+        return sum(self.__weights)
+
+    @property
+    def item_dictionary(self):
+        """
+        Returns the ItemDictionary of the transactions.
+        """
+        return self.__item_dictionary
+
+    @staticmethod
+    def encode(transactions, class_values=None, attribute_of=None, deduplicate=False):
+        """
+        Encode transactions of items (eg. [['A', 'B'], ['B', 'C']]).
+        attribute_of is the attribute code function of the ItemDictionary.
+        If deduplicate, identical transactions are collapsed into weighted ones.
+        """
+        transactions = [list(transaction) for transaction in transactions]
+        items = set()
+        for transaction in transactions:
+            items.update(transaction)
+        item_dictionary = ItemDictionary(items, class_values, attribute_of)
+        encoded = [item_dictionary.encode_items(transaction) for transaction in transactions]
+        encoded_transactions = EncodedTransactions(encoded, item_dictionary)
+        if deduplicate:
+            return encoded_transactions.deduplicate()
+        return encoded_transactions
+
+    @staticmethod
+    def create(transactions, class_values=None, attribute_of=None):
+        """
+        Create the EncodedTransactions with a transaction instance.
+        If the given instance is an EncodedTransactions, this returns itself.
+        """
+        if isinstance(transactions, EncodedTransactions):
+            return transactions
+        return EncodedTransactions.encode(transactions, class_values, attribute_of)
+
+
+def decode_items(items, item_dictionary=None):
+    """
+    Returns items as a sorted list, decoding them if an ItemDictionary is given.
+    """
+    if item_dictionary is None:
+        return sorted(items)
+    return item_dictionary.decode_items(items)
+
+
+def decode(item, item_dictionary=None):
+    """
+    Returns an item, decoding it if an ItemDictionary is given.
+    """
+    if item_dictionary is None:
+        return item
+    return item_dictionary.decode(item)
@@ -0,0 +1,69 @@
+"""
+Supports of the itemsets counted while mining, reused by rule generation.
+"""
+
+
+class SupportTable(object):
+    """
+    Keeps the support of every itemset added, grouped by the itemset length.
+
+    With max_levels set, only the supports of the max_levels longest lengths
+    added so far are kept, and the length being added is never dropped.
+    Rule generation at length k only looks up (k - 1)-itemsets, so two levels
+    are enough for level-wise mining.
+    """
+
+    def __init__(self, max_levels=None):
+        """
+        Initialize.
+
+        Arguments:
+            max_levels -- The number of itemset lengths to keep (>= 2) or None to keep all.
+        """
+        if max_levels is not None and max_levels < 2:
+            raise ValueError('max_levels must be >= 2')
+        self.__max_levels = max_levels
+        self.__levels = {}
+
+    def add(self, items, support):
+        """
+        Add the support of items.
+
+        Arguments:
+            items -- Items as a frozenset (eg. frozenset([0, 1])).
+            support -- The support of the items.
+        """
+        length = len(items)
+        level = self.__levels.get(length)
+        if level is None:
+            level = self.__levels[length] = {}
+            self.__evict(length)
+        level[items] = support
+
+    def get(self, items, default=None):
+        """
+        Returns the support of items or default if it is not known.
+
+        Arguments:
+            items -- Items as a frozenset (eg. frozenset([0, 1])).
+        """
+        level = self.__levels.get(len(items))
+        if level is None:
+            return default
+        return level.get(items, default)
+
+    def __evict(self, length):
+        """
+        Drop the shortest lengths other than length beyond max_levels.
+        """
+        if self.__max_levels is None:
+            return
+        while len(self.__levels) > self.__max_levels:
+            del self.__levels[min(other for other in self.__levels if other != length)]
+
+    def __contains__(self, items):
+        level = self.__levels.get(len(items))
+        return level is not None and items in level
+
+    def __len__(self):
+        return sum(len(level) for level in self.__levels.values())
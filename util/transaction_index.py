@@ -0,0 +1,207 @@
+"""
+Bitmap index of the transactions that contain every item.
+"""
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(bitmap):
+        """
+        Returns the number of bits set in bitmap.
+        """
+        return bin(bitmap).count('1')
+
+
+def weighted_popcount(bitmap, weight_masks=None):
+    """
+    Returns the sum of the weights of the bits set in bitmap.
+
+    Arguments:
+        bitmap -- A transaction bitmap (int).
+        weight_masks -- (weight, bitmap) pairs such that the weight of a transaction is the sum
+                        of the weights of the bitmaps holding it (eg. the bit-planes of the weights)
+                        or None if every transaction weighs 1.
+    """
+    if weight_masks is None:
+        return popcount(bitmap)
+    return sum(weight * popcount(bitmap & weight_mask) for weight, weight_mask in weight_masks)
+
+
+def bits_to_bitmap(tids):
+    """
+    Returns the bitmap with the bits of the sorted transaction indexes set.
+    Bits are written into a bytearray first, so building a bitmap is linear.
+    """
+    bits = bytearray((tids[-1] >> 3) + 1)
+    for tid in tids:
+        bits[tid >> 3] |= 1 << (tid & 7)
+    return int.from_bytes(bytes(bits), 'little')
+
+
+def bitmap_to_tids(bitmap):
+    """
+    Returns the sorted transaction indexes of the bits set in bitmap.
+    """
+    bits = bin(bitmap)[:1:-1]
+    tids = []
+    tid = bits.find('1')
+    while tid >= 0:
+        tids.append(tid)
+        tid = bits.find('1', tid + 1)
+    return tids
+
+
+class TransactionIndex(object):
+    """
+    Keeps one arbitrary-precision int per item: bit i is set if
+    transaction i contains the item. Supports are AND + popcount.
+
+    A transaction may stand for several identical rows. Its weight is then
+    counted through one bitmap per bit of the weights: bitmap b holds the
+    transactions whose weight has bit b set and counts 2 ** b for each of them,
+    so a count takes as many popcounts as the largest weight has bits.
+    """
+
+    def __init__(self):
+        """
+        Initialize.
+        """
+        self.__num_rows = 0
+        self.__num_transaction = 0
+        self.__items = []
+        self.__bitmaps = {}
+        # transaction indexes added since the bitmap of an item was last built
+        self.__pending = {}
+        # transaction indexes of every weight other than 1
+        self.__weight_tids = {}
+        self.__weight_masks = None
+
+    def add_transaction(self, transaction, weight=1):
+        """
+        Add a transaction.
+
+        Arguments:
+            transaction -- A transaction as an iterable object (eg. [0, 1]).
+            weight -- The number of rows the transaction stands for.
+        """
+        tid = self.__num_rows
+        if weight != 1:
+            self.__weight_tids.setdefault(weight, []).append(tid)
+        # every new row widens the bitmap of weight 1 too
+        self.__weight_masks = None
+        for item in transaction:
+            pending = self.__pending.get(item)
+            if pending is None:
+                self.__pending[item] = [tid]
+                if item not in self.__bitmaps:
+                    self.__items.append(item)
+                    self.__bitmaps[item] = 0
+            else:
+                pending.append(tid)
+        self.__num_rows += 1
+        self.__num_transaction += weight
+
+    def __flush(self):
+        """
+        Set the bits of the pending transaction indexes.
+        """
+        for item, tids in self.__pending.items():
+            self.__bitmaps[item] |= bits_to_bitmap(tids)
+        self.__pending = {}
+
+    def bitmap(self, item):
+        """
+        Returns the bitmap of item or None if no transaction contains it.
+        """
+        if self.__pending:
+            self.__flush()
+        return self.__bitmaps.get(item)
+
+    def intersection(self, items):
+        """
+        Returns the bitmap of the transactions that contain all the items.
+
+        Arguments:
+            items -- Items as a non empty iterable object (eg. [0, 1]).
+        """
+        if self.__pending:
+            self.__flush()
+        bitmaps = self.__bitmaps
+        sum_bitmap = None
+        for item in items:
+            bitmap = bitmaps.get(item)
+            if bitmap is None:
+                # No transaction contains a not existing item.
+                return 0
+            if sum_bitmap is None:
+                sum_bitmap = bitmap
+            else:
+                sum_bitmap &= bitmap
+            if not sum_bitmap:
+                break
+        return sum_bitmap
+
+    def count(self, bitmap):
+        """
+        Returns the number of rows of the transactions of bitmap, counting their weights.
+        """
+        return weighted_popcount(bitmap, self.weight_masks)
+
+    def support(self, items):
+        """
+        Returns the number of transactions that contain all the items.
+        """
+        return self.count(self.intersection(items))
+
+    @property
+    def weight_masks(self):
+        """
+        Returns the (2 ** b, bitmap of the transactions whose weight has bit b set) pairs
+        of the bit-planes of the weights or None if every transaction weighs 1.
+        """
+        if not self.__weight_tids:
+            return None
+        if self.__weight_masks is None:
+            # the transactions of weight 1 are not recorded: they are the rows of no other weight
+            planes = [(1 << self.__num_rows) - 1]
+            for weight, tids in self.__weight_tids.items():
+                weight_mask = bits_to_bitmap(tids)
+                if not weight & 1:
+                    planes[0] &= ~weight_mask
+                for bit in range(1, weight.bit_length()):
+                    if bit == len(planes):
+                        planes.append(0)
+                    if weight >> bit & 1:
+                        planes[bit] |= weight_mask
+            self.__weight_masks = [(1 << bit, plane) for bit, plane in enumerate(planes) if plane]
+        return self.__weight_masks
+
+    @property
+    def num_transaction(self):
+        """
+        Returns the number of transactions, counting their weights.
+        """
+        return self.__num_transaction
+
+    @property
+    def num_rows(self):
+        """
+        Returns the number of transactions added, that is the number of bits of the bitmaps.
+        """
+        return self.__num_rows
+
+    @property
+    def items(self):
+        """
+        Returns the items in the order they were first added.
+        """
+        return self.__items
+
+    @property
+    def bitmaps(self):
+        """
+        Returns the dictionary of the bitmaps of the items.
+        """
+        if self.__pending:
+            self.__flush()
+        return self.__bitmaps
@@ -1,6 +1,7 @@
 import constants
 import sys
 import collections
+from item_dictionary import EncodedTransactions
 
 
 #######################
@@ -18,24 +19,60 @@ def unzip_transactions_2(zipped_transactions_file):
     return transactions_list
 
 
+def unzip_encoded_transactions(zipped_transactions_file, class_values=None, deduplicate=False, attribute_of=None):
+    """
+    Read transactions from zipped_transactions_file and encode their items as integer ids.
+    Returns an EncodedTransactions instance that keeps the ItemDictionary for decoding
+    If deduplicate, identical transactions are read once and weighted by their number of rows
+    attribute_of is the attribute code function of the ItemDictionary (eg. item_dictionary.census_attribute_of)
+    """
+    return EncodedTransactions.encode(unzip_transactions_2(zipped_transactions_file), class_values,
+                                      attribute_of, deduplicate=deduplicate)
+
+
 #######################
 # transforming patterns into string
 #######################
+def patterns_header_to_string():
+    return '{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(constants.LHS, constants.RHS,
+                                                   constants.LHS_SUPP_COUNT, constants.RULE_SUPP_COUNT,
+                                                   constants.LHS_SUPP, constants.RULE_SUPP, constants.RULE_CONF,
+                                                   constants.LINKS)
+
+
+def pattern_to_string(pattern):
+    str_result = ''
+    for rule in pattern:
+        str_result += '{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(
+            rule[constants.LHS], rule[constants.RHS],
+            rule[constants.LHS_SUPP_COUNT], rule[constants.RULE_SUPP_COUNT],
+            rule[constants.LHS_SUPP], rule[constants.RULE_SUPP], rule[constants.RULE_CONF], rule[constants.LINKS])
+    str_result += '\n'
+    return str_result
+
+
 def patterns_to_string(patterns_list):
-    str_result = '{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(constants.LHS, constants.RHS,
-                                                           constants.LHS_SUPP_COUNT, constants.RULE_SUPP_COUNT,
-                                                           constants.LHS_SUPP, constants.RULE_SUPP, constants.RULE_CONF,
-                                                           constants.LINKS)
+    str_result = patterns_header_to_string()
     for pattern in patterns_list:
-        for rule in pattern:
-            str_result += '{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(
-                rule[constants.LHS], rule[constants.RHS],
-                rule[constants.LHS_SUPP_COUNT], rule[constants.RULE_SUPP_COUNT],
-                rule[constants.LHS_SUPP], rule[constants.RULE_SUPP], rule[constants.RULE_CONF], rule[constants.LINKS])
-        str_result += '\n'
+        str_result += pattern_to_string(pattern)
     return str_result
 
 
+def write_patterns(patterns, output_file):
+    """
+    Write the text of patterns_to_string into output_file, one pattern at a time,
+    so patterns can be a generator whose patterns are written as soon as they are mined.
+    Returns the number of patterns written.
+    """
+    output_file.write(patterns_header_to_string())
+    num_of_patterns = 0
+    for pattern in patterns:
+        output_file.write(pattern_to_string(pattern))
+        output_file.flush()
+        num_of_patterns += 1
+    return num_of_patterns
+
+
 def rules_to_string(rules_list):
     str_result = '{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(constants.LHS, constants.RHS,
                                                            constants.LHS_SUPP_COUNT, constants.RULE_SUPP_COUNT,